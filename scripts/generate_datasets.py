@@ -6,12 +6,15 @@ Generates FX rates and gold prices datasets with Yemen-specific calculations.
 
 import os
 import sys
+import copy
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import logging
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 
 # Add project root to path
 sys.path.append(str(Path(__file__).parent.parent))
@@ -38,138 +41,151 @@ class DatasetGenerator:
             "sell": -0.01  # 1% discount for selling
         }
         
+        # Seeded PCG64 generator for reproducible, bulk random draws
+        self.seed_seq = np.random.SeedSequence(42)
+        self.rng = np.random.default_rng(self.seed_seq)
+        
         # Historical USD/YER rates (simplified - in production, use real data)
         self.usd_yer_rates = self._generate_historical_usd_yer()
         
     def _generate_historical_usd_yer(self) -> Dict[str, float]:
         """Generate historical USD/YER rates (simplified model)."""
-        rates = {}
         start_date = datetime(2015, 1, 1)
         end_date = datetime.now()
+        dates = pd.date_range(start_date, end_date, freq='D')
         
         # Base rate around 530 YER/USD in 2015, trending upward
         base_rate = 530.0
-        current_date = start_date
         
-        while current_date <= end_date:
-            # Simulate gradual depreciation of YER
-            days_since_start = (current_date - start_date).days
-            depreciation_factor = 1 + (days_since_start * 0.0001)  # 0.01% per day
-            
-            # Add some volatility
-            volatility = np.random.normal(0, 0.05)
-            rate = base_rate * depreciation_factor * (1 + volatility)
-            
-            rates[current_date.strftime('%Y-%m-%d')] = max(rate, 100)  # Floor at 100
-            current_date += timedelta(days=1)
-            
-        return rates
+        # Simulate gradual depreciation of YER (0.01% per day)
+        depreciation_factor = 1 + np.arange(len(dates)) * 0.0001
+        
+        # Add some volatility
+        volatility = self.rng.normal(0, 0.05, size=len(dates))
+        rates = np.maximum(base_rate * depreciation_factor * (1 + volatility), 100)  # Floor at 100
+        
+        return dict(zip(dates.strftime('%Y-%m-%d'), rates.tolist()))
     
     def _get_usd_yer_rate(self, date: datetime) -> float:
         """Get USD/YER rate for a specific date."""
         date_str = date.strftime('%Y-%m-%d')
         return self.usd_yer_rates.get(date_str, 530.0)  # Default fallback
     
-    def _calculate_karat_price(self, base_price_24k: float, karat: int) -> float:
-        """Calculate price for specific karat based on 24k base price."""
-        return base_price_24k * (karat / 24.0)
+    def _get_usd_yer_rates(self, ds: pd.Index) -> np.ndarray:
+        """Get USD/YER rates for an array of ISO date strings in one lookup."""
+        return pd.Series(ds).map(self.usd_yer_rates).fillna(530.0).to_numpy()
+    
+    def _calculate_karat_price(self, base_price_24k, karat):
+        """Calculate price for specific karat based on 24k base price.
+        
+        Accepts scalars or NumPy arrays (broadcast elementwise).
+        """
+        return base_price_24k * np.divide(karat, 24.0)
     
-    def _calculate_retail_price(self, base_price: float, price_type: str) -> float:
-        """Apply retail premiums/discounts."""
-        premium = self.RETAIL_PREMIUMS.get(price_type, 0)
+    def _calculate_retail_price(self, base_price, price_type):
+        """Apply retail premiums/discounts.
+        
+        ``price_type`` may be a single type or an array of types; unknown
+        types (e.g. "spot") get no premium.
+        """
+        if isinstance(price_type, str):
+            premium = self.RETAIL_PREMIUMS.get(price_type, 0)
+        else:
+            premium = pd.Series(price_type).map(self.RETAIL_PREMIUMS).fillna(0).to_numpy()
         return base_price * (1 + premium)
     
     def generate_fx_rates(self, start_date: datetime, end_date: datetime) -> pd.DataFrame:
         """Generate FX rates dataset."""
         logger.info(f"Generating FX rates from {start_date.date()} to {end_date.date()}")
         
-        fx_data = []
-        current_date = start_date
+        # One row per (date, region, rate_type), in that order
+        # ``ds`` is kept as datetime64 and only formatted when saved
+        dates = pd.date_range(start_date, end_date, freq='D')
+        rate_types = ["mid", "buy", "sell"]
+        ds_col, region_col, rate_type_col = np.meshgrid(
+            dates.to_numpy(), np.array(self.YER_REGIONS, dtype=object),
+            np.array(rate_types, dtype=object), indexing="ij"
+        )
         
-        while current_date <= end_date:
-            usd_yer_rate = self._get_usd_yer_rate(current_date)
-            
-            # Generate rates for each region
-            for region in self.YER_REGIONS:
-                # Add regional variation (±2%)
-                regional_factor = np.random.uniform(0.98, 1.02)
-                regional_rate = usd_yer_rate * regional_factor
-                
-                # Generate different rate types
-                for rate_type in ["mid", "buy", "sell"]:
-                    if rate_type == "mid":
-                        rate = regional_rate
-                    elif rate_type == "buy":
-                        rate = regional_rate * 1.005  # Slightly higher for buying USD
-                    else:  # sell
-                        rate = regional_rate * 0.995  # Slightly lower for selling USD
-                    
-                    fx_data.append({
-                        "ds": current_date.strftime('%Y-%m-%d'),
-                        "base": "USD",
-                        "quote": "YER",
-                        "region": region,
-                        "rate": round(rate, 2),
-                        "source": "goldvision_synthetic",
-                        "rate_type": rate_type,
-                        "side": "both"
-                    })
-            
-            current_date += timedelta(days=1)
+        usd_yer_rate = self._get_usd_yer_rates(dates.strftime('%Y-%m-%d'))
+        
+        # Regional variation (±2%) for every day/region pair
+        regional_factors = self.rng.uniform(0.98, 1.02, size=(len(dates), len(self.YER_REGIONS)))
+        regional_rate = usd_yer_rate[:, None] * regional_factors
+        
+        # mid, slightly higher for buying USD, slightly lower for selling USD
+        rates = np.stack(
+            [regional_rate, regional_rate * 1.005, regional_rate * 0.995], axis=-1
+        )
         
-        df = pd.DataFrame(fx_data)
+        df = pd.DataFrame({
+            "ds": ds_col.ravel(),
+            "base": "USD",
+            "quote": "YER",
+            "region": region_col.ravel(),
+            "rate": np.round(rates.ravel(), 2),
+            "source": "goldvision_synthetic",
+            "rate_type": rate_type_col.ravel(),
+            "side": "both"
+        })
         logger.info(f"Generated {len(df)} FX rate records")
         return df
     
-    def generate_gold_prices(self, start_date: datetime, end_date: datetime) -> pd.DataFrame:
-        """Generate gold prices dataset."""
+    def generate_gold_prices(self, start_date: datetime, end_date: datetime,
+                             origin: Optional[datetime] = None) -> pd.DataFrame:
+        """Generate gold prices dataset.
+        
+        ``origin`` anchors the long-term price trend; it defaults to
+        ``start_date`` and lets chunked generation continue the same trend.
+        """
+        origin = origin or start_date
         logger.info(f"Generating gold prices from {start_date.date()} to {end_date.date()}")
         
-        gold_data = []
-        current_date = start_date
+        # One row per (date, karat, region, price_type), in that order
+        dates = pd.date_range(start_date, end_date, freq='D')
+        price_types = ["spot", "buy", "sell"]
+        ds_col, karat_col, region_col, price_type_col = np.meshgrid(
+            dates.to_numpy(), np.array(self.GOLD_KARATS, dtype=np.int64),
+            np.array(self.YER_REGIONS, dtype=object), np.array(price_types, dtype=object),
+            indexing="ij"
+        )
         
         # Historical gold price trends (simplified)
         base_gold_price = 1200.0  # USD per ounce in 2015
         price_trend = 0.0001  # Daily trend
         
-        while current_date <= end_date:
-            days_since_start = (current_date - start_date).days
-            
-            # Calculate base 24k gold price with trend and volatility
-            trend_factor = 1 + (days_since_start * price_trend)
-            volatility = np.random.normal(0, 0.02)  # 2% daily volatility
-            base_price_24k = base_gold_price * trend_factor * (1 + volatility)
-            
-            # Generate prices for each karat and region
-            for karat in self.GOLD_KARATS:
-                karat_price_usd = self._calculate_karat_price(base_price_24k, karat)
-                
-                for region in self.YER_REGIONS:
-                    usd_yer_rate = self._get_usd_yer_rate(current_date)
-                    
-                    # Generate different price types
-                    for price_type in ["spot", "buy", "sell"]:
-                        if price_type == "spot":
-                            price_usd = karat_price_usd
-                        else:
-                            price_usd = self._calculate_retail_price(karat_price_usd, price_type)
-                        
-                        price_yer = price_usd * usd_yer_rate
-                        
-                        gold_data.append({
-                            "ds": current_date.strftime('%Y-%m-%d'),
-                            "unit": "gram",
-                            "karat": karat,
-                            "price_usd": round(price_usd, 2),
-                            "price_yer": round(price_yer, 0),
-                            "price_type": price_type,
-                            "region": region,
-                            "source": "goldvision_synthetic"
-                        })
-            
-            current_date += timedelta(days=1)
+        # Base 24k price with trend and 2% daily volatility
+        trend_factor = 1 + (dates - origin).days.to_numpy() * price_trend
+        volatilities = self.rng.normal(0, 0.02, size=len(dates))
+        base_price_24k = base_gold_price * trend_factor * (1 + volatilities)
+        
+        # The USD/YER rate depends only on the date; resolve it once per day
+        usd_yer_rate = self._get_usd_yer_rates(dates.strftime('%Y-%m-%d'))
+        
+        # (day, karat) prices, then spot/buy/sell premiums on the last axis
+        karat_price_usd = self._calculate_karat_price(
+            base_price_24k[:, None], np.array(self.GOLD_KARATS)
+        )
+        price_usd = self._calculate_retail_price(
+            karat_price_usd[:, :, None], np.array(price_types)
+        )
+        # Same for every region: (day, karat, region, price_type)
+        price_usd = np.broadcast_to(
+            price_usd[:, :, None, :],
+            (len(dates), len(self.GOLD_KARATS), len(self.YER_REGIONS), len(price_types))
+        )
+        price_yer = price_usd * usd_yer_rate[:, None, None, None]
         
-        df = pd.DataFrame(gold_data)
+        df = pd.DataFrame({
+            "ds": ds_col.ravel(),
+            "unit": "gram",
+            "karat": karat_col.ravel(),
+            "price_usd": np.round(price_usd.ravel(), 2),
+            "price_yer": np.round(price_yer.ravel(), 0),
+            "price_type": price_type_col.ravel(),
+            "region": region_col.ravel(),
+            "source": "goldvision_synthetic"
+        })
         logger.info(f"Generated {len(df)} gold price records")
         return df
     
@@ -178,44 +194,154 @@ class DatasetGenerator:
         fx_path = self.output_dir / "fx_yer.csv"
         gold_path = self.output_dir / "gold_prices.csv"
         
-        # Save with proper formatting
-        fx_df.to_csv(fx_path, index=False)
-        gold_df.to_csv(gold_path, index=False)
+        # Save with proper formatting (``ds`` as an ISO date)
+        fx_df.to_csv(fx_path, index=False, date_format='%Y-%m-%d')
+        gold_df.to_csv(gold_path, index=False, date_format='%Y-%m-%d')
         
         logger.info(f"Saved FX rates to {fx_path}")
         logger.info(f"Saved gold prices to {gold_path}")
         
         return str(fx_path), str(gold_path)
     
+    def save_datasets_chunked(self, start_date: datetime, end_date: datetime,
+                              workers: Optional[int] = None,
+                              print_sample: bool = False) -> Tuple[str, str]:
+        """Generate and save datasets one calendar year at a time.
+        
+        Years are independent, so they are generated in up to ``workers``
+        processes (default: one per CPU; ``1`` runs in-process), each with its
+        own child random stream so the output does not depend on ``workers``.
+        Chunks are appended to the CSV files in date order and released once
+        written. With ``print_sample``, the sample report is built from the
+        first and last chunks and per-chunk group sums, so the full datasets
+        are never held in memory.
+        """
+        fx_path = self.output_dir / "fx_yer.csv"
+        gold_path = self.output_dir / "gold_prices.csv"
+        
+        chunks = []
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(datetime(chunk_start.year, 12, 31), end_date)
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+        
+        # SeedSequence.spawn rather than Generator.spawn (numpy>=1.25 only)
+        chunk_rngs = [np.random.default_rng(seq) for seq in self.seed_seq.spawn(len(chunks))]
+        args = (
+            [self] * len(chunks),
+            [chunk[0] for chunk in chunks],
+            [chunk[1] for chunk in chunks],
+            [start_date] * len(chunks),
+            chunk_rngs
+        )
+        
+        fx_total = 0
+        gold_total = 0
+        first_chunk = True
+        fx_head = gold_head = fx_tail = gold_tail = None
+        fx_sums = []
+        gold_sums = []
+        
+        executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else nullcontext()
+        with executor:
+            run = executor.map if workers != 1 else map
+            
+            # Results arrive in chunk order, so appends stay sorted by date
+            for fx_df, gold_df in run(_generate_chunk, *args):
+                fx_df.to_csv(fx_path, mode='w' if first_chunk else 'a', header=first_chunk,
+                             index=False, date_format='%Y-%m-%d')
+                gold_df.to_csv(gold_path, mode='w' if first_chunk else 'a', header=first_chunk,
+                               index=False, date_format='%Y-%m-%d')
+                fx_total += len(fx_df)
+                gold_total += len(gold_df)
+                if print_sample:
+                    if first_chunk:
+                        fx_head, gold_head = fx_df.head(10), gold_df.head(10)
+                    fx_tail, gold_tail = fx_df.tail(10), gold_df.tail(10)
+                    fx_sums.append(_group_sums(fx_df, 'region', 'rate'))
+                    gold_sums.append(_group_sums(gold_df, 'karat', 'price_usd'))
+                del fx_df, gold_df
+                first_chunk = False
+        
+        logger.info(f"Saved {fx_total} FX rate records to {fx_path}")
+        logger.info(f"Saved {gold_total} gold price records to {gold_path}")
+        
+        if print_sample and fx_total:
+            self._print_sample(
+                fx_total, fx_head, fx_tail, _pooled_stats(fx_sums),
+                gold_total, gold_head, gold_tail, _pooled_stats(gold_sums)
+            )
+        
+        return str(fx_path), str(gold_path)
+    
     def print_sample_data(self, fx_df: pd.DataFrame, gold_df: pd.DataFrame):
         """Print head and tail samples of the datasets."""
+        self._print_sample(
+            len(fx_df), fx_df.head(10), fx_df.tail(10),
+            fx_df.groupby('region')['rate'].agg(['count', 'mean', 'std']),
+            len(gold_df), gold_df.head(10), gold_df.tail(10),
+            gold_df.groupby('karat')['price_usd'].agg(['count', 'mean', 'std'])
+        )
+    
+    def _print_sample(self, fx_total: int, fx_head: pd.DataFrame, fx_tail: pd.DataFrame,
+                      fx_stats: pd.DataFrame, gold_total: int, gold_head: pd.DataFrame,
+                      gold_tail: pd.DataFrame, gold_stats: pd.DataFrame):
+        """Print the sample report from precomputed samples and statistics."""
         print("\n" + "="*80)
         print("FX RATES DATASET SAMPLE")
         print("="*80)
-        print(f"Total records: {len(fx_df)}")
+        print(f"Total records: {fx_total}")
         print("\nFirst 10 rows:")
-        print(fx_df.head(10).to_string(index=False))
+        print(fx_head.to_string(index=False))
         print("\nLast 10 rows:")
-        print(fx_df.tail(10).to_string(index=False))
+        print(fx_tail.to_string(index=False))
         
         print("\n" + "="*80)
         print("GOLD PRICES DATASET SAMPLE")
         print("="*80)
-        print(f"Total records: {len(gold_df)}")
+        print(f"Total records: {gold_total}")
         print("\nFirst 10 rows:")
-        print(gold_df.head(10).to_string(index=False))
+        print(gold_head.to_string(index=False))
         print("\nLast 10 rows:")
-        print(gold_df.tail(10).to_string(index=False))
+        print(gold_tail.to_string(index=False))
         
         # Print summary statistics
         print("\n" + "="*80)
         print("SUMMARY STATISTICS")
         print("="*80)
         print("FX Rates by Region:")
-        print(fx_df.groupby('region')['rate'].agg(['count', 'mean', 'std']).round(2))
+        print(fx_stats.round(2))
         
         print("\nGold Prices by Karat:")
-        print(gold_df.groupby('karat')['price_usd'].agg(['count', 'mean', 'std']).round(2))
+        print(gold_stats.round(2))
+
+def _group_sums(df: pd.DataFrame, by: str, column: str) -> pd.DataFrame:
+    """Per-group count, sum and sum of squares of ``column`` for one chunk."""
+    values = df[column]
+    grouped = values.groupby(df[by])
+    return pd.DataFrame({
+        'count': grouped.count(),
+        'sum': grouped.sum(),
+        'sumsq': (values * values).groupby(df[by]).sum()
+    })
+
+def _pooled_stats(sums: List[pd.DataFrame]) -> pd.DataFrame:
+    """Combine per-chunk group sums into count/mean/std (sample std, as pandas)."""
+    total = pd.concat(sums).groupby(level=0).sum()
+    count = total['count']
+    mean = total['sum'] / count
+    var = (total['sumsq'] - total['sum'] * mean) / (count - 1)
+    return pd.DataFrame({'count': count, 'mean': mean, 'std': np.sqrt(var.clip(lower=0))})
+
+def _generate_chunk(generator: DatasetGenerator, start_date: datetime, end_date: datetime,
+                    origin: datetime, rng: np.random.Generator) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Generate one chunk of both datasets (module-level so it pickles for workers)."""
+    generator = copy.copy(generator)
+    generator.rng = rng
+    fx_df = generator.generate_fx_rates(start_date, end_date)
+    gold_df = generator.generate_gold_prices(start_date, end_date, origin=origin)
+    return fx_df, gold_df
 
 def main():
     """Main function to generate datasets."""
@@ -229,15 +355,9 @@ def main():
     generator = DatasetGenerator()
     
     try:
-        # Generate datasets
-        fx_df = generator.generate_fx_rates(start_date, end_date)
-        gold_df = generator.generate_gold_prices(start_date, end_date)
-        
-        # Save datasets
-        fx_path, gold_path = generator.save_datasets(fx_df, gold_df)
-        
-        # Print sample data
-        generator.print_sample_data(fx_df, gold_df)
+        # Generate and save datasets year by year to bound memory use, printing
+        # the sample from the chunks as they are written
+        fx_path, gold_path = generator.save_datasets_chunked(start_date, end_date, print_sample=True)
         
         logger.info("Dataset generation completed successfully!")
         logger.info(f"FX rates: {fx_path}")
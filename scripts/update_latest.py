@@ -6,13 +6,25 @@ Updates existing datasets with the latest 7 days of data.
 
 import os
 import sys
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import logging
+import shutil
 from pathlib import Path
 
+# Optional: pyarrow's multi-threaded CSV reader (also needed for Parquet)
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Add project root to path
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -23,13 +35,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Dataset file suffix per storage format; "partitioned" is a directory of
+# Hive-style daily Parquet partitions (fx_yer/ds=YYYY-MM-DD/part-0.parquet)
+DATASET_SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "partitioned": ""}
+
+def _read_dataset(path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a dataset file, using pyarrow's block parser for CSV when available."""
+    if path.suffix == '':
+        # Partition values are kept as plain ISO date strings
+        partitioning = pads.partitioning(pa.schema([('ds', pa.string())]), flavor='hive')
+        dataset = pads.dataset(path, format='parquet', partitioning=partitioning)
+        df = dataset.to_table(columns=columns).to_pandas()
+        if columns is None:
+            df = df[['ds'] + [c for c in df.columns if c != 'ds']]
+        if not df['ds'].is_monotonic_increasing:
+            df = df.sort_values('ds', kind='stable', ignore_index=True)
+        return df
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path, columns=columns)
+    if PYARROW_AVAILABLE:
+        convert_options = pacsv.ConvertOptions(
+            column_types={'ds': pa.string()},
+            include_columns=columns
+        )
+        return pacsv.read_csv(path, convert_options=convert_options).to_pandas()
+    return pd.read_csv(path, usecols=columns)
+
+def _write_dataset(df: pd.DataFrame, path: Path, append: bool = False):
+    """Write (or append to) a dataset file."""
+    if path.suffix == '':
+        # Appends only write the new days' partitions; history is untouched
+        if not append and path.exists():
+            shutil.rmtree(path)
+        pq.write_to_dataset(
+            pa.Table.from_pandas(df, preserve_index=False),
+            root_path=path,
+            partition_cols=['ds'],
+            basename_template='part-{i}.parquet',
+            existing_data_behavior='delete_matching'
+        )
+        return
+    if path.suffix == '.parquet':
+        # Parquet files are immutable; appending rewrites the (compressed) file
+        if append:
+            df = pd.concat([pd.read_parquet(path), df], ignore_index=True)
+        df.to_parquet(path, compression='snappy', index=False)
+        return
+    # pandas writes CSV so appended rows format values exactly like the history
+    df.to_csv(path, mode='a' if append else 'w', header=not append, index=False)
+
 class DataUpdater:
     """Updates existing datasets with latest data."""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", storage_format: str = "csv"):
         self.data_dir = Path(data_dir)
-        self.fx_path = self.data_dir / "fx_yer.csv"
-        self.gold_path = self.data_dir / "gold_prices.csv"
+        if storage_format == "partitioned" and not PYARROW_AVAILABLE:
+            raise ImportError("Partitioned storage requires pyarrow: pip install pyarrow")
+        suffix = DATASET_SUFFIXES[storage_format]
+        self.fx_path = self.data_dir / f"fx_yer{suffix}"
+        self.gold_path = self.data_dir / f"gold_prices{suffix}"
         
         # Yemen-specific constants
         self.YER_REGIONS = ["SANA", "ADEN", "TAIZ", "HODEIDAH"]
@@ -42,28 +106,33 @@ class DataUpdater:
         # Current USD/YER rate (in production, fetch from API)
         self.current_usd_yer_rate = 530.0
         
-    def _get_usd_yer_rate(self, date: datetime) -> float:
-        """Get USD/YER rate for a specific date."""
-        # In production, this would fetch from a real API
-        # For now, use a simple model with some volatility
-        base_rate = self.current_usd_yer_rate
-        volatility = np.random.normal(0, 0.02)  # 2% volatility
-        return base_rate * (1 + volatility)
-    
-    def _calculate_karat_price(self, base_price_24k: float, karat: int) -> float:
-        """Calculate price for specific karat based on 24k base price."""
-        return base_price_24k * (karat / 24.0)
+        # PCG64 generator for bulk random draws
+        self.rng = np.random.default_rng()
+        
+    def _calculate_karat_price(self, base_price_24k, karat):
+        """Calculate price for specific karat based on 24k base price.
+        
+        Accepts scalars or NumPy arrays (broadcast elementwise).
+        """
+        return base_price_24k * np.divide(karat, 24.0)
     
-    def _calculate_retail_price(self, base_price: float, price_type: str) -> float:
-        """Apply retail premiums/discounts."""
-        premium = self.RETAIL_PREMIUMS.get(price_type, 0)
+    def _calculate_retail_price(self, base_price, price_type):
+        """Apply retail premiums/discounts.
+        
+        ``price_type`` may be a single type or an array of types; unknown
+        types (e.g. "spot") get no premium.
+        """
+        if isinstance(price_type, str):
+            premium = self.RETAIL_PREMIUMS.get(price_type, 0)
+        else:
+            premium = pd.Series(price_type).map(self.RETAIL_PREMIUMS).fillna(0).to_numpy()
         return base_price * (1 + premium)
     
     def load_existing_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """Load existing datasets."""
         try:
-            fx_df = pd.read_csv(self.fx_path) if self.fx_path.exists() else pd.DataFrame()
-            gold_df = pd.read_csv(self.gold_path) if self.gold_path.exists() else pd.DataFrame()
+            fx_df = _read_dataset(self.fx_path) if self.fx_path.exists() else pd.DataFrame()
+            gold_df = _read_dataset(self.gold_path) if self.gold_path.exists() else pd.DataFrame()
             
             logger.info(f"Loaded existing data: FX={len(fx_df)} records, Gold={len(gold_df)} records")
             return fx_df, gold_df
@@ -75,41 +144,39 @@ class DataUpdater:
         """Generate latest FX rates data."""
         logger.info(f"Generating latest FX rates from {start_date.date()} to {end_date.date()}")
         
-        fx_data = []
-        current_date = start_date
+        dates = pd.date_range(start_date, end_date, freq='D').strftime('%Y-%m-%d')
+        rate_types = ["mid", "buy", "sell"]
+        n_days = len(dates)
+        n_regions = len(self.YER_REGIONS)
         
-        while current_date <= end_date:
-            usd_yer_rate = self._get_usd_yer_rate(current_date)
-            
-            # Generate rates for each region
-            for region in self.YER_REGIONS:
-                # Add regional variation (±2%)
-                regional_factor = np.random.uniform(0.98, 1.02)
-                regional_rate = usd_yer_rate * regional_factor
-                
-                # Generate different rate types
-                for rate_type in ["mid", "buy", "sell"]:
-                    if rate_type == "mid":
-                        rate = regional_rate
-                    elif rate_type == "buy":
-                        rate = regional_rate * 1.005  # Slightly higher for buying USD
-                    else:  # sell
-                        rate = regional_rate * 0.995  # Slightly lower for selling USD
-                    
-                    fx_data.append({
-                        "ds": current_date.strftime('%Y-%m-%d'),
-                        "base": "USD",
-                        "quote": "YER",
-                        "region": region,
-                        "rate": round(rate, 2),
-                        "source": "goldvision_synthetic",
-                        "rate_type": rate_type,
-                        "side": "both"
-                    })
-            
-            current_date += timedelta(days=1)
+        # Daily USD/YER rate with 2% volatility
+        usd_yer_rate = self.current_usd_yer_rate * (1 + self.rng.normal(0, 0.02, size=n_days))
+        
+        # Regional variation (±2%)
+        regional_factor = self.rng.uniform(0.98, 1.02, size=(n_days, n_regions))
+        
+        # mid, slightly higher for buying USD, slightly lower for selling USD
+        rate_multiplier = np.array([1.0, 1.005, 0.995])
+        
+        # Broadcast to (day, region, rate_type) and flatten in row order
+        rates = (usd_yer_rate[:, None, None]
+                 * regional_factor[:, :, None]
+                 * rate_multiplier[None, None, :]).round(2).ravel()
+        
+        index = pd.MultiIndex.from_product(
+            [dates, self.YER_REGIONS, rate_types], names=["ds", "region", "rate_type"]
+        )
+        df = pd.DataFrame({"rate": rates}, index=index).reset_index()
+        df = df.assign(base="USD", quote="YER", source="goldvision_synthetic", side="both")[
+            ["ds", "base", "quote", "region", "rate", "source", "rate_type", "side"]
+        ]
         
-        df = pd.DataFrame(fx_data)
+        # Compact dtypes: categorical repeated strings. Rates stay float64 so
+        # they merge with the history without float32 rounding artifacts
+        df = df.astype({
+            "base": "category", "quote": "category", "region": "category",
+            "source": "category", "rate_type": "category", "side": "category"
+        })
         logger.info(f"Generated {len(df)} latest FX rate records")
         return df
     
@@ -117,77 +184,139 @@ class DataUpdater:
         """Generate latest gold prices data."""
         logger.info(f"Generating latest gold prices from {start_date.date()} to {end_date.date()}")
         
-        gold_data = []
-        current_date = start_date
+        dates = pd.date_range(start_date, end_date, freq='D').strftime('%Y-%m-%d')
+        price_types = ["spot", "buy", "sell"]
+        n_days = len(dates)
+        n_karats = len(self.GOLD_KARATS)
+        n_regions = len(self.YER_REGIONS)
+        n_types = len(price_types)
         
         # Current gold price (in production, fetch from API)
         current_gold_price = 2000.0  # USD per ounce
         
-        while current_date <= end_date:
-            # Add some daily volatility
-            volatility = np.random.normal(0, 0.02)  # 2% daily volatility
-            base_price_24k = current_gold_price * (1 + volatility)
-            
-            # Generate prices for each karat and region
-            for karat in self.GOLD_KARATS:
-                karat_price_usd = self._calculate_karat_price(base_price_24k, karat)
-                
-                for region in self.YER_REGIONS:
-                    usd_yer_rate = self._get_usd_yer_rate(current_date)
-                    
-                    # Generate different price types
-                    for price_type in ["spot", "buy", "sell"]:
-                        if price_type == "spot":
-                            price_usd = karat_price_usd
-                        else:
-                            price_usd = self._calculate_retail_price(karat_price_usd, price_type)
-                        
-                        price_yer = price_usd * usd_yer_rate
-                        
-                        gold_data.append({
-                            "ds": current_date.strftime('%Y-%m-%d'),
-                            "unit": "gram",
-                            "karat": karat,
-                            "price_usd": round(price_usd, 2),
-                            "price_yer": round(price_yer, 0),
-                            "price_type": price_type,
-                            "region": region,
-                            "source": "goldvision_synthetic"
-                        })
-            
-            current_date += timedelta(days=1)
+        # Base 24k price with 2% daily volatility
+        base_price_24k = current_gold_price * (1 + self.rng.normal(0, 0.02, size=n_days))
+        
+        # USD/YER rate is a function of the date only: one draw per day,
+        # shared by every karat and region (2% volatility)
+        usd_yer_rate = self.current_usd_yer_rate * (1 + self.rng.normal(0, 0.02, size=n_days))
+        
+        # (day, karat) prices, then spot/buy/sell premiums on the last axis
+        karat_price_usd = self._calculate_karat_price(
+            base_price_24k[:, None], np.array(self.GOLD_KARATS)
+        )
+        price_usd = self._calculate_retail_price(
+            karat_price_usd[:, :, None], np.array(price_types)
+        )
+        # Same for every region: (day, karat, region, price_type)
+        price_usd = np.broadcast_to(
+            price_usd[:, :, None, :], (n_days, n_karats, n_regions, n_types)
+        )
+        price_yer = price_usd * usd_yer_rate[:, None, None, None]
         
-        df = pd.DataFrame(gold_data)
+        index = pd.MultiIndex.from_product(
+            [dates, self.GOLD_KARATS, self.YER_REGIONS, price_types],
+            names=["ds", "karat", "region", "price_type"]
+        )
+        df = pd.DataFrame({
+            "price_usd": np.round(price_usd, 2).ravel(),
+            "price_yer": np.round(price_yer, 0).astype(np.int32).ravel()
+        }, index=index).reset_index()
+        df = df.assign(unit="gram", source="goldvision_synthetic")[
+            ["ds", "unit", "karat", "price_usd", "price_yer", "price_type", "region", "source"]
+        ]
+        
+        # Compact dtypes: int8 karat (YER price is already a whole-number
+        # int32), categorical repeated strings. USD prices stay float64 so
+        # they merge with the history without float32 rounding artifacts
+        df = df.astype({
+            "karat": "int8",
+            "unit": "category", "price_type": "category", "region": "category",
+            "source": "category"
+        })
         logger.info(f"Generated {len(df)} latest gold price records")
         return df
     
     def merge_datasets(self, existing_df: pd.DataFrame, new_df: pd.DataFrame, 
                       key_columns: List[str]) -> pd.DataFrame:
-        """Merge new data with existing data, removing duplicates."""
+        """Merge new data with existing data, removing duplicates.
+        
+        New data always covers a trailing date window, so existing rows from
+        its first date onwards are dropped and the new rows appended. ``ds``
+        stays an ISO date string, which sorts lexicographically.
+        """
         if existing_df.empty:
             return new_df
         
-        # Convert date columns to datetime for proper comparison
-        existing_df['ds'] = pd.to_datetime(existing_df['ds'])
-        new_df['ds'] = pd.to_datetime(new_df['ds'])
-        
-        # Remove existing records that overlap with new data
-        existing_df = existing_df[~existing_df['ds'].isin(new_df['ds'])]
+        # Datasets are stored date-sorted; only sort if that was violated
+        if not existing_df['ds'].is_monotonic_increasing:
+            existing_df = existing_df.sort_values('ds', kind='stable')
         
-        # Combine datasets
-        merged_df = pd.concat([existing_df, new_df], ignore_index=True)
+        # Truncate existing data where the new window starts
+        cut = np.searchsorted(existing_df['ds'].to_numpy(), new_df['ds'].min(), side='left')
+        existing_df = existing_df.iloc[:cut]
         
-        # Sort by date
-        merged_df = merged_df.sort_values('ds')
-        
-        # Convert back to string format
-        merged_df['ds'] = merged_df['ds'].dt.strftime('%Y-%m-%d')
+        # Combine datasets; an empty remainder is left out so it can't
+        # affect the result dtypes
+        frames = [existing_df, new_df] if cut else [new_df]
+        merged_df = pd.concat(frames, ignore_index=True)
         
         logger.info(f"Merged datasets: {len(merged_df)} total records")
         return merged_df
     
-    def update_datasets(self) -> Tuple[str, str]:
-        """Update datasets with latest data."""
+    def _read_max_date(self, path: Path) -> Optional[str]:
+        """Return the latest ``ds`` in a dataset, reading only that column."""
+        if not path.exists():
+            return None
+        
+        if path.is_dir():
+            # Partition directory names carry the dates; no file reads needed
+            days = [p.name.split('=', 1)[1] for p in path.glob('ds=*')]
+            return max(days) if days else None
+        
+        ds = _read_dataset(path, columns=['ds'])['ds']
+        return ds.max() if not ds.empty else None
+    
+    def update_datasets(self, rebuild: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Update datasets with latest data.
+        
+        By default only rows dated after the latest existing ``ds`` are
+        generated and appended. ``rebuild`` restores the full
+        load/merge/rewrite of the last 7 days.
+        
+        Returns the FX and gold frames that were written.
+        """
+        if rebuild:
+            return self.rebuild_datasets()
+        
+        logger.info("Starting incremental dataset update...")
+        
+        end_date = datetime.now()
+        default_start = end_date - timedelta(days=7)
+        written = []
+        
+        for path, generate in ((self.fx_path, self.generate_latest_fx_rates),
+                               (self.gold_path, self.generate_latest_gold_prices)):
+            max_ds = self._read_max_date(path)
+            if max_ds:
+                start_date = datetime.strptime(max_ds, '%Y-%m-%d') + timedelta(days=1)
+            else:
+                start_date = default_start
+            
+            if start_date > end_date:
+                logger.info(f"{path} is already up to date ({max_ds})")
+                written.append(pd.DataFrame())
+                continue
+            
+            new_df = generate(start_date, end_date)
+            _write_dataset(new_df, path, append=path.exists())
+            logger.info(f"Appended {len(new_df)} records to {path}")
+            written.append(new_df)
+        
+        return written[0], written[1]
+    
+    def rebuild_datasets(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Regenerate the last 7 days and rewrite the merged datasets."""
         logger.info("Starting dataset update...")
         
         # Load existing data
@@ -206,52 +335,58 @@ class DataUpdater:
         updated_gold = self.merge_datasets(existing_gold, new_gold, ['ds', 'karat', 'region', 'price_type'])
         
         # Save updated datasets
-        updated_fx.to_csv(self.fx_path, index=False)
-        updated_gold.to_csv(self.gold_path, index=False)
+        _write_dataset(updated_fx, self.fx_path)
+        _write_dataset(updated_gold, self.gold_path)
         
         logger.info(f"Updated FX rates: {len(updated_fx)} total records")
         logger.info(f"Updated gold prices: {len(updated_gold)} total records")
         
-        return str(self.fx_path), str(self.gold_path)
+        return updated_fx, updated_gold
     
-    def print_update_summary(self, fx_path: str, gold_path: str):
-        """Print summary of the update."""
-        fx_df = pd.read_csv(fx_path)
-        gold_df = pd.read_csv(gold_path)
-        
+    def print_update_summary(self, fx_df: pd.DataFrame, gold_df: pd.DataFrame):
+        """Print summary of the update from the frames that were written."""
         print("\n" + "="*80)
         print("DATASET UPDATE SUMMARY")
         print("="*80)
-        print(f"FX Rates: {len(fx_df)} total records")
-        print(f"Gold Prices: {len(gold_df)} total records")
+        print(f"FX Rates ({self.fx_path}): {len(fx_df)} records written")
+        print(f"Gold Prices ({self.gold_path}): {len(gold_df)} records written")
         
         # Show latest dates
-        latest_fx_date = fx_df['ds'].max()
-        latest_gold_date = gold_df['ds'].max()
+        latest_fx_date = fx_df['ds'].max() if not fx_df.empty else "unchanged"
+        latest_gold_date = gold_df['ds'].max() if not gold_df.empty else "unchanged"
         
         print(f"\nLatest FX data: {latest_fx_date}")
         print(f"Latest Gold data: {latest_gold_date}")
         
         # Show recent samples
-        print("\nLatest 5 FX records:")
-        print(fx_df.tail(5).to_string(index=False))
+        if not fx_df.empty:
+            print("\nLatest 5 FX records:")
+            print(fx_df.tail(5).to_string(index=False))
         
-        print("\nLatest 5 Gold records:")
-        print(gold_df.tail(5).to_string(index=False))
+        if not gold_df.empty:
+            print("\nLatest 5 Gold records:")
+            print(gold_df.tail(5).to_string(index=False))
 
 def main():
     """Main function to update datasets."""
     logger.info("Starting dataset update...")
     
+    parser = argparse.ArgumentParser(description='Update GoldVision datasets with the latest data')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Regenerate the last 7 days and rewrite the full datasets')
+    parser.add_argument('--format', choices=sorted(DATASET_SUFFIXES), default='csv',
+                        help='Dataset storage format (parquet/partitioned require pyarrow)')
+    args = parser.parse_args()
+    
     # Initialize updater
-    updater = DataUpdater()
+    updater = DataUpdater(storage_format=args.format)
     
     try:
         # Update datasets
-        fx_path, gold_path = updater.update_datasets()
+        fx_df, gold_df = updater.update_datasets(rebuild=args.rebuild)
         
         # Print summary
-        updater.print_update_summary(fx_path, gold_path)
+        updater.print_update_summary(fx_df, gold_df)
         
         logger.info("Dataset update completed successfully!")
         
@@ -13,16 +13,28 @@ from typing import Dict, List, Tuple, Optional
 import logging
 from pathlib import Path
 import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Google Sheets API imports
 try:
+    import httplib2
     from google.oauth2.service_account import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
     from googleapiclient.discovery import build
     from googleapiclient.errors import HttpError
 except ImportError:
-    print("Error: Google API client not installed. Run: pip install google-api-python-client google-auth")
+    print("Error: Google API client not installed. Run: pip install google-api-python-client google-auth google-auth-httplib2")
     sys.exit(1)
 
+# Optional: Arrow-native conversion of sheet rows
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Add project root to path
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -33,18 +45,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Cells per values().batchUpdate request; larger writes are split into
+# several requests of about this size
+CELLS_PER_BATCH = 50000
+
+# Socket timeout (seconds) for the shared Sheets HTTP connection
+HTTP_TIMEOUT = 30
+
 class SheetsUploader:
     """Handles uploading datasets to Google Sheets."""
     
-    def __init__(self, credentials_path: str, spreadsheet_id: str, data_dir: str = "data"):
+    def __init__(self, credentials_path: str, spreadsheet_id: str, data_dir: str = "data",
+                 storage_format: str = "csv"):
         self.credentials_path = Path(credentials_path)
         self.spreadsheet_id = spreadsheet_id
         self.data_dir = Path(data_dir)
-        self.fx_path = self.data_dir / "fx_yer.csv"
-        self.gold_path = self.data_dir / "gold_prices.csv"
+        suffix = {"parquet": ".parquet", "partitioned": ""}.get(storage_format, ".csv")
+        self.fx_path = self.data_dir / f"fx_yer{suffix}"
+        self.gold_path = self.data_dir / f"gold_prices{suffix}"
+        
+        # Rows last written per sheet, keyed by spreadsheet; used to skip
+        # redundant clears (local state, gitignored)
+        self.row_counts_path = self.data_dir / ".sheets_row_counts.json"
+        self._row_counts_lock = threading.Lock()
+        
+        # Initialize Google Sheets service (one per thread, see ``service``)
+        self._local = threading.local()
+        self._local.service = self._initialize_service()
+    
+    @property
+    def service(self):
+        """Sheets service for the calling thread.
         
-        # Initialize Google Sheets service
-        self.service = self._initialize_service()
+        The underlying httplib2 connection is not thread-safe, so worker
+        threads lazily build their own service instead of sharing one.
+        """
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._initialize_service()
+            self._local.service = service
+        return service
         
     def _initialize_service(self):
         """Initialize Google Sheets service."""
@@ -58,8 +98,10 @@ class SheetsUploader:
                 scopes=['https://www.googleapis.com/auth/spreadsheets']
             )
             
-            # Build service
-            service = build('sheets', 'v4', credentials=credentials)
+            # One authorized keep-alive connection reused by every RPC, and the
+            # discovery document bundled with the client (no network fetch)
+            http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+            service = build('sheets', 'v4', http=http, static_discovery=True)
             logger.info("Google Sheets service initialized successfully")
             return service
             
@@ -68,9 +110,21 @@ class SheetsUploader:
             raise
     
     def _load_dataset(self, file_path: Path) -> pd.DataFrame:
-        """Load dataset from CSV file."""
+        """Load dataset from a CSV or Parquet file, or a ds-partitioned Parquet directory."""
         try:
-            df = pd.read_csv(file_path)
+            if Path(file_path).is_dir():
+                df = pd.read_parquet(file_path)
+                # The partition column comes back last and categorical
+                df['ds'] = df['ds'].astype(str)
+                df = df[['ds'] + [c for c in df.columns if c != 'ds']]
+            elif Path(file_path).suffix == '.parquet':
+                df = pd.read_parquet(file_path)
+            elif PYARROW_AVAILABLE:
+                # Multi-threaded native parse; ds stays the ISO string the
+                # incremental filter and the sheet rows expect
+                df = pd.read_csv(file_path, engine='pyarrow', dtype={'ds': str})
+            else:
+                df = pd.read_csv(file_path)
             logger.info(f"Loaded {len(df)} records from {file_path}")
             return df
         except Exception as e:
@@ -79,8 +133,15 @@ class SheetsUploader:
     
     def _prepare_data_for_sheets(self, df: pd.DataFrame) -> List[List]:
         """Prepare DataFrame for Google Sheets upload."""
-        # Convert DataFrame to list of lists
-        data = [df.columns.tolist()] + df.values.tolist()
+        # Convert column by column and zip into rows, avoiding the
+        # intermediate 2D object array of df.values. Arrow's C++ converters
+        # are used when available (NaN becomes None, which serializes to JSON)
+        if PYARROW_AVAILABLE:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            columns = [col.to_pylist() for col in table.columns]
+        else:
+            columns = [df[col].tolist() for col in df.columns]
+        data = [df.columns.tolist()] + [list(row) for row in zip(*columns)]
         return data
     
     def _clear_sheet(self, sheet_name: str):
@@ -101,31 +162,142 @@ class SheetsUploader:
             logger.error(f"Error clearing sheet {sheet_name}: {e}")
             raise
     
+    def _read_all_row_counts(self) -> Dict[str, Dict[str, int]]:
+        """Load the recorded row counts of every spreadsheet."""
+        try:
+            with open(self.row_counts_path) as f:
+                row_counts = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return row_counts if isinstance(row_counts, dict) else {}
+    
+    def _read_row_counts(self) -> Dict[str, int]:
+        """Load the number of rows last written to each sheet of this spreadsheet."""
+        row_counts = self._read_all_row_counts().get(self.spreadsheet_id)
+        return row_counts if isinstance(row_counts, dict) else {}
+    
+    def _record_row_count(self, sheet_name: str, rows: int):
+        """Remember how many rows were written to a sheet."""
+        # Sheets upload concurrently; serialize the read-modify-write
+        with self._row_counts_lock:
+            row_counts = self._read_all_row_counts()
+            sheet_counts = row_counts.get(self.spreadsheet_id)
+            if not isinstance(sheet_counts, dict):
+                sheet_counts = row_counts[self.spreadsheet_id] = {}
+            sheet_counts[sheet_name] = rows
+            with open(self.row_counts_path, 'w') as f:
+                json.dump(row_counts, f)
+    
+    def _clear_stale_rows(self, sheet_name: str, new_rows: int):
+        """Clear only rows beyond the new data, and only if it may have shrunk.
+        
+        Without a recorded count for this spreadsheet (first upload, lost or
+        foreign state file) the whole sheet is cleared.
+        """
+        previous_rows = self._read_row_counts().get(sheet_name)
+        if previous_rows is None:
+            self._clear_sheet(sheet_name)
+            return
+        if previous_rows <= new_rows:
+            logger.info(f"Skipping clear of {sheet_name}: new data covers previous {previous_rows} rows")
+            return
+        
+        try:
+            range_name = f"{sheet_name}!A{new_rows + 1}:Z{previous_rows}"
+            
+            self.service.spreadsheets().values().clear(
+                spreadsheetId=self.spreadsheet_id,
+                range=range_name
+            ).execute()
+            
+            logger.info(f"Cleared stale rows: {range_name}")
+            
+        except HttpError as e:
+            logger.error(f"Error clearing stale rows in {sheet_name}: {e}")
+            raise
+    
     def _update_sheet(self, sheet_name: str, data: List[List]):
         """Update a sheet with new data."""
+        self._update_sheets({sheet_name: data})
+    
+    def _update_sheets(self, sheets: Dict[str, List[List]]):
+        """Update several sheets with new data, batching about CELLS_PER_BATCH cells per RPC."""
+        sheet_names = ", ".join(sheets)
         try:
-            # Prepare range
-            range_name = f"{sheet_name}!A1"
+            # Split each sheet's rows into ValueRanges of at most
+            # CELLS_PER_BATCH cells, then pack consecutive ranges into
+            # requests without exceeding that budget (small sheets share one)
+            batches, batch, batch_cells = [], [], 0
+            for sheet_name, data in sheets.items():
+                width = max((len(row) for row in data), default=1) or 1
+                rows_per_range = max(1, CELLS_PER_BATCH // width)
+                for start in range(0, len(data), rows_per_range):
+                    values = data[start:start + rows_per_range]
+                    cells = len(values) * width
+                    if batch and batch_cells + cells > CELLS_PER_BATCH:
+                        batches.append(batch)
+                        batch, batch_cells = [], 0
+                    batch.append({'range': f"{sheet_name}!A{start + 1}", 'values': values})
+                    batch_cells += cells
+            if batch:
+                batches.append(batch)
             
-            # Update values
-            body = {
-                'values': data
-            }
+            updated_cells = 0
+            for value_ranges in batches:
+                body = {
+                    'valueInputOption': 'RAW',
+                    'data': value_ranges
+                }
+                result = self.service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body=body
+                ).execute()
+                updated_cells += result.get('totalUpdatedCells', 0)
+            
+            logger.info(f"Updated {updated_cells} cells in sheets: {sheet_names} "
+                        f"({len(batches)} requests)")
             
-            result = self.service.spreadsheets().values().update(
+        except HttpError as e:
+            logger.error(f"Error updating sheets {sheet_names}: {e}")
+            raise
+    
+    def _append_rows(self, sheet_name: str, rows: List[List]) -> int:
+        """Append rows after the last non-empty row of a sheet."""
+        try:
+            result = self.service.spreadsheets().values().append(
                 spreadsheetId=self.spreadsheet_id,
-                range=range_name,
+                range=f"{sheet_name}!A:A",
                 valueInputOption='RAW',
-                body=body
+                insertDataOption='INSERT_ROWS',
+                body={'values': rows}
             ).execute()
             
-            updated_cells = result.get('updatedCells', 0)
-            logger.info(f"Updated {updated_cells} cells in sheet: {sheet_name}")
+            updated_rows = result.get('updates', {}).get('updatedRows', 0)
+            logger.info(f"Appended {updated_rows} rows to sheet: {sheet_name}")
+            return updated_rows
             
         except HttpError as e:
-            logger.error(f"Error updating sheet {sheet_name}: {e}")
+            logger.error(f"Error appending to sheet {sheet_name}: {e}")
             raise
     
+    def _upload_incremental(self, sheet_name: str, file_path: Path, since_date: str) -> int:
+        """Append only dataset rows dated on or after ``since_date``."""
+        df = self._load_dataset(file_path)
+        new_df = df[df['ds'] >= since_date]
+        if new_df.empty:
+            logger.info(f"No rows since {since_date} for sheet: {sheet_name}")
+            return 0
+        
+        # Drop the header row; the sheet already has one
+        rows = self._prepare_data_for_sheets(new_df)[1:]
+        self._append_rows(sheet_name, rows)
+        
+        previous_rows = self._read_row_counts().get(sheet_name)
+        if previous_rows is not None:
+            self._record_row_count(sheet_name, previous_rows + len(rows))
+        
+        return len(rows)
+    
     def _format_sheet(self, sheet_name: str):
         """Apply formatting to a sheet."""
         try:
@@ -192,53 +364,91 @@ class SheetsUploader:
             logger.error(f"Error formatting sheet {sheet_name}: {e}")
             # Don't raise - formatting is not critical
     
-    def upload_fx_rates(self):
+    def _prepare_upload(self, sheet_name: str, file_path: Path, rebuild: bool) -> List[List]:
+        """Load a dataset as sheet rows and clear what they won't overwrite."""
+        data = self._prepare_data_for_sheets(self._load_dataset(file_path))
+        
+        # Rebuild clears the whole sheet; otherwise overwrite in place and
+        # clear only rows the new data no longer covers
+        if rebuild:
+            self._clear_sheet(sheet_name)
+        else:
+            self._clear_stale_rows(sheet_name, len(data))
+        return data
+    
+    def _write_sheets(self, sheets: Dict[str, List[List]]):
+        """Write prepared sheets in one RPC, then record and format each."""
+        self._update_sheets(sheets)
+        for sheet_name, data in sheets.items():
+            self._record_row_count(sheet_name, len(data))
+            self._format_sheet(sheet_name)
+    
+    def upload_fx_rates(self, rebuild: bool = False):
         """Upload FX rates to Google Sheets."""
         logger.info("Uploading FX rates to Google Sheets...")
-        
-        # Load data
-        fx_df = self._load_dataset(self.fx_path)
-        
-        # Prepare data
-        fx_data = self._prepare_data_for_sheets(fx_df)
-        
-        # Clear and update sheet
-        self._clear_sheet("fx_rates")
-        self._update_sheet("fx_rates", fx_data)
-        self._format_sheet("fx_rates")
-        
-        logger.info(f"Successfully uploaded {len(fx_df)} FX rate records")
+        fx_data = self._prepare_upload("fx_rates", self.fx_path, rebuild)
+        self._write_sheets({"fx_rates": fx_data})
+        logger.info(f"Successfully uploaded {len(fx_data) - 1} FX rate records")
     
-    def upload_gold_prices(self):
+    def upload_gold_prices(self, rebuild: bool = False):
         """Upload gold prices to Google Sheets."""
         logger.info("Uploading gold prices to Google Sheets...")
-        
-        # Load data
-        gold_df = self._load_dataset(self.gold_path)
-        
-        # Prepare data
-        gold_data = self._prepare_data_for_sheets(gold_df)
-        
-        # Clear and update sheet
-        self._clear_sheet("gold_prices")
-        self._update_sheet("gold_prices", gold_data)
-        self._format_sheet("gold_prices")
-        
-        logger.info(f"Successfully uploaded {len(gold_df)} gold price records")
+        gold_data = self._prepare_upload("gold_prices", self.gold_path, rebuild)
+        self._write_sheets({"gold_prices": gold_data})
+        logger.info(f"Successfully uploaded {len(gold_data) - 1} gold price records")
     
-    def upload_all(self):
-        """Upload all datasets to Google Sheets."""
+    def upload_fx_rates_incremental(self, since_date: str):
+        """Append FX rates dated on or after ``since_date``."""
+        logger.info(f"Appending FX rates since {since_date} to Google Sheets...")
+        count = self._upload_incremental("fx_rates", self.fx_path, since_date)
+        logger.info(f"Successfully appended {count} FX rate records")
+    
+    def upload_gold_prices_incremental(self, since_date: str):
+        """Append gold prices dated on or after ``since_date``."""
+        logger.info(f"Appending gold prices since {since_date} to Google Sheets...")
+        count = self._upload_incremental("gold_prices", self.gold_path, since_date)
+        logger.info(f"Successfully appended {count} gold price records")
+    
+    def upload_all(self, since_date: Optional[str] = None, rebuild: bool = False,
+                   verify: bool = False):
+        """Upload all datasets to Google Sheets.
+        
+        With ``since_date`` only rows from that date onwards are appended;
+        ``rebuild`` clears each sheet before a full upload. The two sheets
+        are independent, so they are loaded (or appended) concurrently; a
+        full upload then writes both sheets in a single batchUpdate.
+        ``verify`` reads back a sample of each sheet afterwards.
+        """
         logger.info("Starting Google Sheets upload...")
         
         try:
-            # Upload FX rates
-            self.upload_fx_rates()
+            incremental = since_date and not rebuild
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                if incremental:
+                    futures = [
+                        executor.submit(self.upload_fx_rates_incremental, since_date),
+                        executor.submit(self.upload_gold_prices_incremental, since_date)
+                    ]
+                else:
+                    futures = [
+                        executor.submit(self._prepare_upload, "fx_rates", self.fx_path, rebuild),
+                        executor.submit(self._prepare_upload, "gold_prices", self.gold_path, rebuild)
+                    ]
+                
+                # Re-raise the first upload error, if any
+                results = [future.result() for future in futures]
             
-            # Upload gold prices
-            self.upload_gold_prices()
+            if not incremental:
+                fx_data, gold_data = results
+                self._write_sheets({"fx_rates": fx_data, "gold_prices": gold_data})
+                logger.info(f"Successfully uploaded {len(fx_data) - 1} FX rate and "
+                            f"{len(gold_data) - 1} gold price records")
             
             logger.info("All datasets uploaded successfully!")
             
+            if verify:
+                self.verify_upload()
+            
         except Exception as e:
             logger.error(f"Error uploading datasets: {e}")
             raise
@@ -248,25 +458,18 @@ class SheetsUploader:
         logger.info("Verifying upload...")
         
         try:
-            # Check FX rates sheet
-            fx_range = "fx_rates!A1:H10"
-            fx_result = self.service.spreadsheets().values().get(
+            # Only the first 5 rows of each sheet are printed; fetch just
+            # those, for both sheets in one RPC
+            result = self.service.spreadsheets().values().batchGet(
                 spreadsheetId=self.spreadsheet_id,
-                range=fx_range
+                ranges=["fx_rates!A1:H5", "gold_prices!A1:H5"]
             ).execute()
             
-            fx_values = fx_result.get('values', [])
-            logger.info(f"FX rates sheet has {len(fx_values)} rows (first 10)")
-            
-            # Check gold prices sheet
-            gold_range = "gold_prices!A1:H10"
-            gold_result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range=gold_range
-            ).execute()
-            
-            gold_values = gold_result.get('values', [])
-            logger.info(f"Gold prices sheet has {len(gold_values)} rows (first 10)")
+            fx_range, gold_range = result.get('valueRanges', [{}, {}])
+            fx_values = fx_range.get('values', [])
+            gold_values = gold_range.get('values', [])
+            logger.info(f"FX rates sheet has {len(fx_values)} rows (first 5)")
+            logger.info(f"Gold prices sheet has {len(gold_values)} rows (first 5)")
             
             # Print sample data
             print("\n" + "="*80)
@@ -289,11 +492,19 @@ class SheetsUploader:
 
 def main():
     """Main function to upload datasets to Google Sheets."""
+    parser = argparse.ArgumentParser(description='Upload GoldVision datasets to Google Sheets')
+    parser.add_argument('--since', metavar='YYYY-MM-DD',
+                        help='Append only rows dated on or after this date')
+    parser.add_argument('--rebuild-sheets', action='store_true',
+                        help='Clear each sheet and upload the full datasets')
+    args = parser.parse_args()
+    
     logger.info("Starting Google Sheets upload...")
     
     # Configuration
     credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', 'credentials.json')
     spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID', '')
+    storage_format = os.getenv('DATASET_FORMAT', 'csv')
     
     if not spreadsheet_id:
         logger.error("GOOGLE_SPREADSHEET_ID environment variable not set")
@@ -301,13 +512,11 @@ def main():
     
     try:
         # Initialize uploader
-        uploader = SheetsUploader(credentials_path, spreadsheet_id)
-        
-        # Upload all datasets
-        uploader.upload_all()
+        uploader = SheetsUploader(credentials_path, spreadsheet_id, storage_format=storage_format)
         
-        # Verify upload
-        uploader.verify_upload()
+        # Upload all datasets; the read-back check is opt-in
+        verify = os.getenv('GOLDVISION_VERIFY_SHEETS') == '1'
+        uploader.upload_all(since_date=args.since, rebuild=args.rebuild_sheets, verify=verify)
         
         logger.info("Google Sheets upload completed successfully!")
         
@@ -0,0 +1,11 @@
+"""Shared pytest configuration for the Python test suite.
+
+The data-pipeline tests can run in parallel with pytest-xdist
+(``pytest -n auto --dist loadgroup tests/test_data_pipeline.py``); each test
+class is kept on one worker with ``@pytest.mark.xdist_group``.
+"""
+
+
+def pytest_configure(config):
+    # Registered by pytest-xdist; declare it so plain pytest runs stay quiet
+    config.addinivalue_line("markers", "xdist_group(name): run tests of a group on one xdist worker")
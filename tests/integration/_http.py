@@ -0,0 +1,12 @@
+"""HTTP settings and test accounts shared by the Python integration scripts."""
+
+from urllib3.util.retry import Retry
+
+# Connection resets and gateway errors are retried for idempotent methods only
+# (urllib3's default set); POSTs such as ingests and alerts are never replayed
+RETRY = Retry(total=3, connect=3, read=2, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+
+# Accounts used by the RBAC checks: the seeded demo admin and a regular user
+DEMO_CREDS = {"email": "demo@goldvision.com", "password": "demo123"}
+TEST_USER_CREDS = {"email": "testuser@example.com", "password": "testpass123"}
+TEST_USER_BODY = {**TEST_USER_CREDS, "locale": "en"}
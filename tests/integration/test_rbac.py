@@ -1,104 +1,290 @@
 #!/usr/bin/env python3
 """Test RBAC (Role-Based Access Control) functionality."""
 
+import asyncio
+import pytest
 import requests
+import hashlib
+import importlib.util
 import json
+import os
 import time
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from requests.adapters import HTTPAdapter
+
+from _http import DEMO_CREDS, RETRY, TEST_USER_BODY, TEST_USER_CREDS
+
+# Optional: async client that sends the admin-endpoint probes from one event loop
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# HTTP/2 support in httpx needs the optional h2 package. It is only
+# negotiated over TLS (ALPN), so the default http:// base URL stays on HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Optional: faster JSON encoding for the pre-serialized request bodies and
+# decoding straight from response bytes
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+    json_loads = json.loads
+
+# Constant request bodies, serialized once
+JSON_HEADERS = {"Content-Type": "application/json"}
+ADMIN_INGEST_BODY = json_dumps({"rows": [{"ds": "2025-01-20", "price": 2050.0}]})
+USER_INGEST_BODY = json_dumps({"rows": [{"ds": "2025-01-21", "price": 2055.0}]})
+ADMIN_ALERT_BODY = json_dumps({"rule_type": "price_above", "threshold": 2000.0, "direction": "above"})
+USER_ALERT_BODY = json_dumps({"rule_type": "price_below", "threshold": 1900.0, "direction": "below"})
+
+# Recorded responses for offline runs: USE_MOCK_PROVIDER=1 replays them,
+# UPDATE_MOCK_CACHE=1 hits the live server and (re)records them
+MOCK_DIR = Path(__file__).resolve().parents[1] / "fixtures" / "rbac_mocks"
+USE_MOCK_PROVIDER = os.getenv("USE_MOCK_PROVIDER") == "1"
+UPDATE_MOCK_CACHE = os.getenv("UPDATE_MOCK_CACHE") == "1"
+
+
+class MockableSession:
+    """requests.Session wrapper that can record responses to disk and replay them.
+    
+    Responses are keyed by principal, method, URL, per-call headers and body.
+    The principal stands in for the session's Authorization header, whose
+    token changes from one login to the next.
+    """
+    
+    def __init__(self, session: requests.Session, principal: str):
+        self.session = session
+        self.principal = principal
+    
+    @property
+    def headers(self):
+        return self.session.headers
+    
+    def _key(self, method: str, url: str, kwargs: Dict[str, Any]) -> str:
+        body = kwargs.get("data")
+        if body is None and "json" in kwargs:
+            body = json.dumps(kwargs["json"], sort_keys=True)
+        if isinstance(body, str):
+            body = body.encode()
+        digest = hashlib.sha256(f"{self.principal}\0{method}\0{url}\0".encode())
+        digest.update(repr(sorted((kwargs.get("headers") or {}).items())).encode())
+        digest.update(b"\0" + (body or b""))
+        return digest.hexdigest()
+    
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        path = MOCK_DIR / f"{self._key(method, url, kwargs)}.json"
+        if USE_MOCK_PROVIDER and not UPDATE_MOCK_CACHE:
+            if not path.exists():
+                pytest.skip(f"No recorded response for {self.principal} {method} {url} in "
+                            f"{MOCK_DIR}; record one against a live backend with UPDATE_MOCK_CACHE=1")
+            recorded = json.loads(path.read_text())
+            response = requests.Response()
+            response.status_code = recorded["status_code"]
+            response._content = recorded["body"].encode()
+            response.encoding = "utf-8"
+            response.url = url
+            return response
+        
+        response = self.session.request(method, url, **kwargs)
+        if UPDATE_MOCK_CACHE:
+            MOCK_DIR.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({
+                "method": method,
+                "url": url,
+                "status_code": response.status_code,
+                "body": response.text,
+            }, indent=2))
+        return response
+    
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+    
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+    
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
 
 
 class RBACTester:
     """Test RBAC functionality."""
     
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    ENDPOINTS = {
+        "signup": "/auth/signup",
+        "login": "/auth/login",
+        "ingest": "/prices/ingest",
+        "fetch_latest": "/fetch-latest",
+        "alerts": "/alerts",
+    }
+    ADMIN_ENDPOINTS = (
+        "/admin/data-source",
+        "/admin/metrics",
+        "/admin/scheduler",
+        "/notifications/status",
+        "/notifications/test"
+    )
+    
+    def __init__(self, base_url: str = "http://localhost:8000",
+                 adapter: Optional[HTTPAdapter] = None):
         self.base_url = base_url
-        self.session = requests.Session()
+        # Full URLs are built once rather than formatted on every request
+        self.urls = {name: base_url + path for name, path in self.ENDPOINTS.items()}
+        self.admin_urls = [(endpoint, base_url + endpoint) for endpoint in self.ADMIN_ENDPOINTS]
+        # One session per principal, each carrying its own Authorization
+        # header. Passing ``adapter`` lets both draw on an existing pool
+        adapter = adapter or HTTPAdapter(pool_connections=2, pool_maxsize=20, max_retries=RETRY)
+        self.admin_session = MockableSession(self._make_session(adapter), "admin")
+        self.user_session = MockableSession(self._make_session(adapter), "user")
         self.admin_token = None
         self.user_token = None
+        # Auth headers are built once per login; the sessions carry them too
+        self.admin_headers = {}
+        self.user_headers = {}
+        # Progress lines are buffered and written once per test phase
+        self._log = []
+    
+    @staticmethod
+    def _make_session(adapter: HTTPAdapter) -> requests.Session:
+        """Create a session that sends its requests through ``adapter``."""
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
+    def use_tokens(self, admin_token: str, user_token: str):
+        """Authenticate both sessions with tokens obtained elsewhere."""
+        self.admin_token = admin_token
+        self.user_token = user_token
+        self.admin_headers = {"Authorization": f"Bearer {admin_token}"}
+        self.user_headers = {"Authorization": f"Bearer {user_token}"}
+        self.admin_session.headers.update(self.admin_headers)
+        self.user_session.headers.update(self.user_headers)
+    
+    def _flush_log(self):
+        """Write the buffered progress lines to stdout in one call."""
+        if self._log:
+            print("\n".join(self._log))
+            self._log.clear()
     
     def create_test_user(self) -> bool:
         """Create a test user for RBAC testing."""
         try:
-            response = self.session.post(f"{self.base_url}/auth/signup", json={
-                "email": "testuser@example.com",
-                "password": "testpass123",
-                "locale": "en"
-            })
+            response = self.user_session.post(self.urls["signup"], json=TEST_USER_BODY)
             
             if response.status_code == 201:
-                print("✅ Test user created successfully")
+                self._log.append("✅ Test user created successfully")
                 return True
             else:
-                print(f"⚠️  Test user creation: {response.status_code} - {response.text}")
+                self._log.append(f"⚠️  Test user creation: {response.status_code} - {response.text}")
                 return False
         except Exception as e:
-            print(f"❌ Error creating test user: {e}")
+            self._log.append(f"❌ Error creating test user: {e}")
             return False
     
     def login_admin(self) -> bool:
         """Login as admin user."""
         try:
-            response = self.session.post(f"{self.base_url}/auth/login", json={
-                "email": "demo@goldvision.com",
-                "password": "demo123"
-            })
+            response = self.admin_session.post(self.urls["login"], json=DEMO_CREDS)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 self.admin_token = data["access_token"]
-                print("✅ Admin login successful")
+                self.admin_headers = {"Authorization": f"Bearer {self.admin_token}"}
+                self.admin_session.headers.update(self.admin_headers)
+                self._log.append("✅ Admin login successful")
                 return True
             else:
-                print(f"❌ Admin login failed: {response.status_code}")
+                self._log.append(f"❌ Admin login failed: {response.status_code}")
                 return False
         except Exception as e:
-            print(f"❌ Admin login error: {e}")
+            self._log.append(f"❌ Admin login error: {e}")
             return False
     
     def login_user(self) -> bool:
         """Login as regular user."""
         try:
-            response = self.session.post(f"{self.base_url}/auth/login", json={
-                "email": "testuser@example.com",
-                "password": "testpass123"
-            })
+            response = self.user_session.post(self.urls["login"], json=TEST_USER_CREDS)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 self.user_token = data["access_token"]
-                print("✅ User login successful")
+                self.user_headers = {"Authorization": f"Bearer {self.user_token}"}
+                self.user_session.headers.update(self.user_headers)
+                self._log.append("✅ User login successful")
                 return True
             else:
-                print(f"❌ User login failed: {response.status_code}")
+                self._log.append(f"❌ User login failed: {response.status_code}")
                 return False
         except Exception as e:
-            print(f"❌ User login error: {e}")
+            self._log.append(f"❌ User login error: {e}")
             return False
     
+    async def _probe_admin_endpoints_async(self) -> Dict[tuple, Any]:
+        """Send every admin-endpoint probe from one event loop with httpx."""
+        principals = (("admin", self.admin_headers), ("user", self.user_headers))
+        keys = [(endpoint, role) for endpoint in self.ADMIN_ENDPOINTS for role, _ in principals]
+        # Over HTTPS with h2 installed, all probes multiplex onto one connection
+        limits = httpx.Limits(max_keepalive_connections=10, max_connections=10)
+        async with httpx.AsyncClient(base_url=self.base_url, http2=HTTP2_AVAILABLE,
+                                     limits=limits) as client:
+            responses = await asyncio.gather(*(
+                client.get(endpoint, headers=headers)
+                for endpoint in self.ADMIN_ENDPOINTS
+                for _, headers in principals
+            ))
+        return dict(zip(keys, responses))
+    
+    def _probe_admin_endpoints(self) -> Dict[tuple, Any]:
+        """GET every admin-only endpoint as both admin and user, concurrently.
+        
+        Responses are keyed by ``(endpoint, role)``. Uses httpx on an event
+        loop when installed, otherwise a thread pool over the two sessions;
+        record/replay mode always goes through the sessions.
+        """
+        if HTTPX_AVAILABLE and not (USE_MOCK_PROVIDER or UPDATE_MOCK_CACHE):
+            return asyncio.run(self._probe_admin_endpoints_async())
+        
+        tasks = [
+            (endpoint, url, role, session)
+            for endpoint, url in self.admin_urls
+            for role, session in (("admin", self.admin_session), ("user", self.user_session))
+        ]
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            return dict(zip(
+                ((endpoint, role) for endpoint, _, role, _ in tasks),
+                executor.map(lambda task: task[3].get(task[1]), tasks)
+            ))
+    
     def test_admin_endpoints(self) -> Dict[str, Any]:
         """Test admin-only endpoints."""
-        print("\n🛡️  Testing Admin-Only Endpoints")
-        print("-" * 40)
+        self._log.append("\n🛡️  Testing Admin-Only Endpoints")
+        self._log.append("-" * 40)
         
         results = {}
-        admin_headers = {"Authorization": f"Bearer {self.admin_token}"} if self.admin_token else {}
-        user_headers = {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
         
         # Test /prices/ingest
-        print("\n1. Testing /prices/ingest")
+        self._log.append("\n1. Testing /prices/ingest")
         
         # Admin should succeed
-        admin_response = self.session.post(
-            f"{self.base_url}/prices/ingest",
-            json={"rows": [{"ds": "2025-01-20", "price": 2050.0}]},
-            headers=admin_headers
+        admin_response = self.admin_session.post(
+            self.urls["ingest"],
+            data=ADMIN_INGEST_BODY,
+            headers=JSON_HEADERS
         )
         
         # User should get 403
-        user_response = self.session.post(
-            f"{self.base_url}/prices/ingest",
-            json={"rows": [{"ds": "2025-01-21", "price": 2055.0}]},
-            headers=user_headers
+        user_response = self.user_session.post(
+            self.urls["ingest"],
+            data=USER_INGEST_BODY,
+            headers=JSON_HEADERS
         )
         
         results["prices_ingest"] = {
@@ -109,22 +295,20 @@ class RBACTester:
             "rbac_working": admin_response.status_code == 200 and user_response.status_code == 403
         }
         
-        print(f"  Admin (200 expected): {admin_response.status_code}")
-        print(f"  User (403 expected): {user_response.status_code}")
+        self._log.append(f"  Admin (200 expected): {admin_response.status_code}")
+        self._log.append(f"  User (403 expected): {user_response.status_code}")
         
         # Test /fetch-latest
-        print("\n2. Testing /fetch-latest")
+        self._log.append("\n2. Testing /fetch-latest")
         
         # Admin should succeed
-        admin_response = self.session.post(
-            f"{self.base_url}/fetch-latest",
-            headers=admin_headers
+        admin_response = self.admin_session.post(
+            self.urls["fetch_latest"]
         )
         
         # User should get 403
-        user_response = self.session.post(
-            f"{self.base_url}/fetch-latest",
-            headers=user_headers
+        user_response = self.user_session.post(
+            self.urls["fetch_latest"]
         )
         
         results["fetch_latest"] = {
@@ -135,32 +319,18 @@ class RBACTester:
             "rbac_working": admin_response.status_code == 200 and user_response.status_code == 403
         }
         
-        print(f"  Admin (200 expected): {admin_response.status_code}")
-        print(f"  User (403 expected): {user_response.status_code}")
+        self._log.append(f"  Admin (200 expected): {admin_response.status_code}")
+        self._log.append(f"  User (403 expected): {user_response.status_code}")
         
         # Test admin endpoints
-        admin_endpoints = [
-            "/admin/data-source",
-            "/admin/metrics", 
-            "/admin/scheduler",
-            "/notifications/status",
-            "/notifications/test"
-        ]
+        responses = self._probe_admin_endpoints()
         
-        for endpoint in admin_endpoints:
-            print(f"\n3. Testing {endpoint}")
+        for endpoint in self.ADMIN_ENDPOINTS:
+            self._log.append(f"\n3. Testing {endpoint}")
             
-            # Admin should succeed
-            admin_response = self.session.get(
-                f"{self.base_url}{endpoint}",
-                headers=admin_headers
-            )
-            
-            # User should get 403
-            user_response = self.session.get(
-                f"{self.base_url}{endpoint}",
-                headers=user_headers
-            )
+            # Admin should succeed, user should get 403
+            admin_response = responses[(endpoint, "admin")]
+            user_response = responses[(endpoint, "user")]
             
             results[endpoint] = {
                 "admin_status": admin_response.status_code,
@@ -170,77 +340,74 @@ class RBACTester:
                 "rbac_working": admin_response.status_code == 200 and user_response.status_code == 403
             }
             
-            print(f"  Admin (200 expected): {admin_response.status_code}")
-            print(f"  User (403 expected): {user_response.status_code}")
+            self._log.append(f"  Admin (200 expected): {admin_response.status_code}")
+            self._log.append(f"  User (403 expected): {user_response.status_code}")
         
+        self._flush_log()
         return results
     
     def test_user_alert_isolation(self) -> Dict[str, Any]:
         """Test that users can only see/modify their own alerts."""
-        print("\n🔒 Testing User Alert Isolation")
-        print("-" * 40)
+        self._log.append("\n🔒 Testing User Alert Isolation")
+        self._log.append("-" * 40)
         
         results = {}
-        admin_headers = {"Authorization": f"Bearer {self.admin_token}"} if self.admin_token else {}
-        user_headers = {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
         
         # Create alerts for both users
-        print("\n1. Creating alerts for both users")
+        self._log.append("\n1. Creating alerts for both users")
         
         # Admin creates alert
-        admin_alert_response = self.session.post(
-            f"{self.base_url}/alerts",
-            json={"rule_type": "price_above", "threshold": 2000.0, "direction": "above"},
-            headers=admin_headers
+        admin_alert_response = self.admin_session.post(
+            self.urls["alerts"],
+            data=ADMIN_ALERT_BODY,
+            headers=JSON_HEADERS
         )
         
         # User creates alert
-        user_alert_response = self.session.post(
-            f"{self.base_url}/alerts",
-            json={"rule_type": "price_below", "threshold": 1900.0, "direction": "below"},
-            headers=user_headers
+        user_alert_response = self.user_session.post(
+            self.urls["alerts"],
+            data=USER_ALERT_BODY,
+            headers=JSON_HEADERS
         )
         
         admin_alert_id = None
         user_alert_id = None
         
         if admin_alert_response.status_code == 200:
-            admin_alert_id = admin_alert_response.json()["alert"]["id"]
-            print(f"  ✅ Admin alert created (ID: {admin_alert_id})")
+            admin_alert_id = json_loads(admin_alert_response.content)["alert"]["id"]
+            self._log.append(f"  ✅ Admin alert created (ID: {admin_alert_id})")
         
         if user_alert_response.status_code == 200:
-            user_alert_id = user_alert_response.json()["alert"]["id"]
-            print(f"  ✅ User alert created (ID: {user_alert_id})")
+            user_alert_id = json_loads(user_alert_response.content)["alert"]["id"]
+            self._log.append(f"  ✅ User alert created (ID: {user_alert_id})")
         
         # Test alert visibility
-        print("\n2. Testing alert visibility")
+        self._log.append("\n2. Testing alert visibility")
         
         # Admin gets their alerts
-        admin_alerts_response = self.session.get(
-            f"{self.base_url}/alerts",
-            headers=admin_headers
+        admin_alerts_response = self.admin_session.get(
+            self.urls["alerts"]
         )
         
         # User gets their alerts
-        user_alerts_response = self.session.get(
-            f"{self.base_url}/alerts",
-            headers=user_headers
+        user_alerts_response = self.user_session.get(
+            self.urls["alerts"]
         )
         
         admin_alerts = []
         user_alerts = []
         
         if admin_alerts_response.status_code == 200:
-            admin_alerts = admin_alerts_response.json()["alerts"]
-            print(f"  Admin sees {len(admin_alerts)} alerts")
+            admin_alerts = json_loads(admin_alerts_response.content)["alerts"]
+            self._log.append(f"  Admin sees {len(admin_alerts)} alerts")
         
         if user_alerts_response.status_code == 200:
-            user_alerts = user_alerts_response.json()["alerts"]
-            print(f"  User sees {len(user_alerts)} alerts")
+            user_alerts = json_loads(user_alerts_response.content)["alerts"]
+            self._log.append(f"  User sees {len(user_alerts)} alerts")
         
         # Check isolation
-        admin_alert_ids = [alert["id"] for alert in admin_alerts]
-        user_alert_ids = [alert["id"] for alert in user_alerts]
+        admin_alert_ids = {alert["id"] for alert in admin_alerts}
+        user_alert_ids = {alert["id"] for alert in user_alerts}
         
         # Users should not see each other's alerts
         isolation_working = (
@@ -256,28 +423,25 @@ class RBACTester:
             "isolation_working": isolation_working
         }
         
-        print(f"  ✅ Alert isolation working: {isolation_working}")
+        self._log.append(f"  ✅ Alert isolation working: {isolation_working}")
         
         # Test alert deletion
-        print("\n3. Testing alert deletion permissions")
+        self._log.append("\n3. Testing alert deletion permissions")
         
         if admin_alert_id and user_alert_id:
             # User tries to delete admin's alert (should fail)
-            user_delete_admin_response = self.session.delete(
-                f"{self.base_url}/alerts/{admin_alert_id}",
-                headers=user_headers
+            user_delete_admin_response = self.user_session.delete(
+                f"{self.urls['alerts']}/{admin_alert_id}"
             )
             
             # Admin tries to delete user's alert (should fail)
-            admin_delete_user_response = self.session.delete(
-                f"{self.base_url}/alerts/{user_alert_id}",
-                headers=admin_headers
+            admin_delete_user_response = self.admin_session.delete(
+                f"{self.urls['alerts']}/{user_alert_id}"
             )
             
             # User deletes their own alert (should succeed)
-            user_delete_own_response = self.session.delete(
-                f"{self.base_url}/alerts/{user_alert_id}",
-                headers=user_headers
+            user_delete_own_response = self.user_session.delete(
+                f"{self.urls['alerts']}/{user_alert_id}"
             )
             
             results["alert_deletion"] = {
@@ -291,28 +455,33 @@ class RBACTester:
                 )
             }
             
-            print(f"  User cannot delete admin alert (404 expected): {user_delete_admin_response.status_code}")
-            print(f"  Admin cannot delete user alert (404 expected): {admin_delete_user_response.status_code}")
-            print(f"  User can delete own alert (200 expected): {user_delete_own_response.status_code}")
+            self._log.append(f"  User cannot delete admin alert (404 expected): {user_delete_admin_response.status_code}")
+            self._log.append(f"  Admin cannot delete user alert (404 expected): {admin_delete_user_response.status_code}")
+            self._log.append(f"  User can delete own alert (200 expected): {user_delete_own_response.status_code}")
         
+        self._flush_log()
         return results
     
-    def run_all_tests(self) -> Dict[str, Any]:
-        """Run all RBAC tests."""
-        print("🚀 GoldVision RBAC Tests")
-        print("=" * 50)
-        
-        # Create test user
-        self.create_test_user()
-        
-        # Login as both users
-        if not self.login_admin():
-            print("❌ Cannot proceed without admin login")
-            return {}
+    def run_all_tests(self) -> Tuple[Dict[str, Any], bool]:
+        """Run all RBAC tests and return ``(results, all_passed)``."""
+        self._log.append("🚀 GoldVision RBAC Tests")
+        self._log.append("=" * 50)
+        
+        # Sign up and log in, unless tokens were supplied via use_tokens()
+        if not (self.admin_token and self.user_token):
+            self.create_test_user()
+            
+            if not self.login_admin():
+                self._log.append("❌ Cannot proceed without admin login")
+                self._flush_log()
+                return {}, False
+            
+            if not self.login_user():
+                self._log.append("❌ Cannot proceed without user login")
+                self._flush_log()
+                return {}, False
         
-        if not self.login_user():
-            print("❌ Cannot proceed without user login")
-            return {}
+        self._flush_log()
         
         # Run tests
         admin_results = self.test_admin_endpoints()
@@ -325,15 +494,15 @@ class RBACTester:
         }
         
         # Print summary
-        self.print_summary(all_results)
+        all_passed = self.print_summary(all_results)
         
-        return all_results
+        return all_results, all_passed
     
-    def print_summary(self, results: Dict[str, Any]):
-        """Print test summary."""
-        print("\n" + "="*60)
-        print("📊 RBAC TEST SUMMARY")
-        print("="*60)
+    def print_summary(self, results: Dict[str, Any]) -> bool:
+        """Print test summary and return whether every check passed."""
+        self._log.append("\n" + "="*60)
+        self._log.append("📊 RBAC TEST SUMMARY")
+        self._log.append("="*60)
         
         # Admin endpoints summary
         admin_results = results.get("admin_endpoints", {})
@@ -341,20 +510,20 @@ class RBACTester:
                                if isinstance(result, dict) and result.get("rbac_working", False))
         admin_total_tests = len(admin_results)
         
-        print(f"\n🛡️  Admin Endpoints: {admin_tests_passed}/{admin_total_tests} working correctly")
+        self._log.append(f"\n🛡️  Admin Endpoints: {admin_tests_passed}/{admin_total_tests} working correctly")
         
         for endpoint, result in admin_results.items():
             if isinstance(result, dict):
                 status = "✅ PASS" if result.get("rbac_working", False) else "❌ FAIL"
-                print(f"  {endpoint}: {status}")
+                self._log.append(f"  {endpoint}: {status}")
         
         # Alert isolation summary
         isolation_results = results.get("alert_isolation", {})
-        isolation_working = isolation_results.get("isolation_working", False)
+        isolation_working = isolation_results.get("alert_isolation", {}).get("isolation_working", False)
         deletion_working = isolation_results.get("alert_deletion", {}).get("deletion_permissions_working", False)
         
-        print(f"\n🔒 Alert Isolation: {'✅ PASS' if isolation_working else '❌ FAIL'}")
-        print(f"🔒 Deletion Permissions: {'✅ PASS' if deletion_working else '❌ FAIL'}")
+        self._log.append(f"\n🔒 Alert Isolation: {'✅ PASS' if isolation_working else '❌ FAIL'}")
+        self._log.append(f"🔒 Deletion Permissions: {'✅ PASS' if deletion_working else '❌ FAIL'}")
         
         # Overall status
         overall_success = (
@@ -363,21 +532,42 @@ class RBACTester:
             deletion_working
         )
         
-        print(f"\n🎯 Overall RBAC Status: {'✅ ALL TESTS PASSED' if overall_success else '❌ SOME TESTS FAILED'}")
+        self._log.append(f"\n🎯 Overall RBAC Status: {'✅ ALL TESTS PASSED' if overall_success else '❌ SOME TESTS FAILED'}")
         
         if overall_success:
-            print("\n✅ RBAC is properly implemented:")
-            print("  - Admin-only endpoints are protected")
-            print("  - Users can only access their own alerts")
-            print("  - Alert deletion permissions are enforced")
+            self._log.append("\n✅ RBAC is properly implemented:")
+            self._log.append("  - Admin-only endpoints are protected")
+            self._log.append("  - Users can only access their own alerts")
+            self._log.append("  - Alert deletion permissions are enforced")
         else:
-            print("\n❌ RBAC issues detected:")
+            self._log.append("\n❌ RBAC issues detected:")
             if admin_tests_passed < admin_total_tests:
-                print("  - Some admin endpoints are not properly protected")
+                self._log.append("  - Some admin endpoints are not properly protected")
             if not isolation_working:
-                print("  - Alert isolation is not working")
+                self._log.append("  - Alert isolation is not working")
             if not deletion_working:
-                print("  - Alert deletion permissions are not enforced")
+                self._log.append("  - Alert deletion permissions are not enforced")
+        
+        self._flush_log()
+        return overall_success
+
+
+@pytest.mark.xdist_group(name="stateful")
+def test_rbac(session, request):
+    """Run the full RBAC suite over the package-wide connection pool.
+    
+    In replay mode nothing touches the network: the logins behind the
+    ``tokens`` fixture are skipped, since recordings are keyed by principal
+    rather than by token.
+    """
+    tester = RBACTester(adapter=session.get_adapter("http://"))
+    if USE_MOCK_PROVIDER and not UPDATE_MOCK_CACHE:
+        tester.use_tokens("replay-admin", "replay-user")
+    else:
+        tokens = request.getfixturevalue("tokens")
+        tester.use_tokens(tokens["admin"], tokens["user"])
+    _, all_passed = tester.run_all_tests()
+    assert all_passed, "RBAC checks failed; see the summary above"
 
 
 def main():
@@ -390,23 +580,9 @@ def main():
     args = parser.parse_args()
     
     tester = RBACTester(args.url)
-    results = tester.run_all_tests()
+    _, all_passed = tester.run_all_tests()
     
     # Exit with appropriate code
-    admin_results = results.get("admin_endpoints", {})
-    admin_tests_passed = sum(1 for result in admin_results.values() 
-                           if isinstance(result, dict) and result.get("rbac_working", False))
-    admin_total_tests = len(admin_results)
-    
-    isolation_working = results.get("alert_isolation", {}).get("isolation_working", False)
-    deletion_working = results.get("alert_isolation", {}).get("alert_deletion", {}).get("deletion_permissions_working", False)
-    
-    all_passed = (
-        admin_tests_passed == admin_total_tests and
-        isolation_working and
-        deletion_working
-    )
-    
     exit(0 if all_passed else 1)
 
 
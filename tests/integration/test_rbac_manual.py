@@ -3,51 +3,93 @@
 
 import requests
 import json
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _http import RETRY
+
+# Optional: faster JSON encoding for the pre-serialized request bodies and
+# decoding straight from response bytes
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+    json_loads = json.loads
 
 BASE_URL = "http://localhost:8000"
 
-def test_rbac():
+# Ingest payloads, serialized once
+JSON_HEADERS = {"Content-Type": "application/json"}
+ADMIN_INGEST_BODY = json_dumps({
+    "rows": [
+        {"ds": "2025-01-01T00:00:00", "price": 2000.0},
+        {"ds": "2025-01-02T00:00:00", "price": 2010.0}
+    ]
+})
+USER_INGEST_BODY = json_dumps({
+    "rows": [
+        {"ds": "2025-01-03T00:00:00", "price": 2020.0}
+    ]
+})
+
+def make_session():
+    """Create the keep-alive session used when running this script directly."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=20,
+        max_retries=RETRY,
+    ))
+    return session
+
+def wait_for_server():
+    """Poll /health on a throwaway session, backing off for about 7.5 seconds.
+
+    Five retries at backoff_factor=0.25 sleep 0 + 0.5 + 1 + 2 + 4 seconds, on
+    urllib3 1.26 and 2.x alike. The long retry budget only suits the readiness
+    probe, so it is kept off the session shared by the RBAC requests.
+    """
+    with requests.Session() as probe:
+        probe.mount("http://", HTTPAdapter(max_retries=Retry(
+            total=5, backoff_factor=0.25, status_forcelist=[502, 503, 504],
+        )))
+        try:
+            return probe.get(f"{BASE_URL}/health", timeout=2).status_code == 200
+        except requests.RequestException:
+            return False
+
+def test_rbac(session):
     print("Testing RBAC functionality...")
     
     # Wait for server to be ready
     print("Waiting for server to be ready...")
-    for i in range(10):
-        try:
-            response = requests.get(f"{BASE_URL}/health", timeout=5)
-            if response.status_code == 200:
-                print("Server is ready!")
-                break
-        except:
-            time.sleep(1)
-    else:
-        print("Server not ready after 10 seconds")
+    if not wait_for_server():
+        print("Server not ready after retrying")
         return
+    print("Server is ready!")
     
     # Test 1: Login as demo user (should be admin after migration)
     print("\n1. Testing admin login...")
-    login_response = requests.post(f"{BASE_URL}/auth/login", json={
+    login_response = session.post(f"{BASE_URL}/auth/login", json={
         "email": "demo@goldvision.com",
         "password": "demo123"
     })
     
     if login_response.status_code == 200:
-        admin_token = login_response.json()["access_token"]
+        admin_token = json_loads(login_response.content)["access_token"]
         print("✅ Admin login successful")
         
         # Test admin can access admin endpoints
         print("\n2. Testing admin access to admin endpoints...")
         
         # Test price ingestion
-        ingest_response = requests.post(
+        ingest_response = session.post(
             f"{BASE_URL}/prices/ingest",
-            headers={"Authorization": f"Bearer {admin_token}"},
-            json={
-                "rows": [
-                    {"ds": "2025-01-01T00:00:00", "price": 2000.0},
-                    {"ds": "2025-01-02T00:00:00", "price": 2010.0}
-                ]
-            }
+            headers={"Authorization": f"Bearer {admin_token}", **JSON_HEADERS},
+            data=ADMIN_INGEST_BODY
         )
         
         if ingest_response.status_code == 200:
@@ -57,7 +99,7 @@ def test_rbac():
             print(ingest_response.text)
         
         # Test fetch latest
-        fetch_response = requests.post(
+        fetch_response = session.post(
             f"{BASE_URL}/fetch-latest",
             headers={"Authorization": f"Bearer {admin_token}"}
         )
@@ -73,7 +115,7 @@ def test_rbac():
     
     # Test 2: Create a regular user
     print("\n3. Testing regular user creation...")
-    register_response = requests.post(f"{BASE_URL}/auth/register", json={
+    register_response = session.post(f"{BASE_URL}/auth/register", json={
         "email": "testuser@example.com",
         "password": "password123"
     })
@@ -82,27 +124,23 @@ def test_rbac():
         print("✅ Regular user created")
         
         # Login as regular user
-        user_login_response = requests.post(f"{BASE_URL}/auth/login", json={
+        user_login_response = session.post(f"{BASE_URL}/auth/login", json={
             "email": "testuser@example.com",
             "password": "password123"
         })
         
         if user_login_response.status_code == 200:
-            user_token = user_login_response.json()["access_token"]
+            user_token = json_loads(user_login_response.content)["access_token"]
             print("✅ Regular user login successful")
             
             # Test regular user cannot access admin endpoints
             print("\n4. Testing regular user access to admin endpoints...")
             
             # Test price ingestion - should be forbidden
-            user_ingest_response = requests.post(
+            user_ingest_response = session.post(
                 f"{BASE_URL}/prices/ingest",
-                headers={"Authorization": f"Bearer {user_token}"},
-                json={
-                    "rows": [
-                        {"ds": "2025-01-03T00:00:00", "price": 2020.0}
-                    ]
-                }
+                headers={"Authorization": f"Bearer {user_token}", **JSON_HEADERS},
+                data=USER_INGEST_BODY
             )
             
             if user_ingest_response.status_code == 403:
@@ -112,7 +150,7 @@ def test_rbac():
                 print(user_ingest_response.text)
             
             # Test fetch latest - should be forbidden
-            user_fetch_response = requests.post(
+            user_fetch_response = session.post(
                 f"{BASE_URL}/fetch-latest",
                 headers={"Authorization": f"Bearer {user_token}"}
             )
@@ -127,7 +165,7 @@ def test_rbac():
             print("\n5. Testing regular user access to regular endpoints...")
             
             # Test alerts endpoint
-            alerts_response = requests.get(
+            alerts_response = session.get(
                 f"{BASE_URL}/alerts",
                 headers={"Authorization": f"Bearer {user_token}"}
             )
@@ -147,4 +185,5 @@ def test_rbac():
     print("\nRBAC testing completed!")
 
 if __name__ == "__main__":
-    test_rbac()
+    with make_session() as session:
+        test_rbac(session)
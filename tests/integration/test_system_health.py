@@ -4,188 +4,320 @@
 import requests
 import json
 import time
+import hashlib
+import logging
+import logging.handlers
+import os
+import pytest
+import shutil
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from requests.adapters import HTTPAdapter
+from pathlib import Path
 
-def test_backend_health():
+from _http import RETRY
+
+# Optional: faster JSON parsing straight from the response bytes
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+FRONTEND_DIR = Path(os.environ.get(
+    "GOLDVISION_FRONTEND", Path(__file__).resolve().parents[2] / "frontend"
+))
+# Resolved once so the build runs npm by absolute path
+NPM = shutil.which("npm") or "npm"
+# Hash of the frontend build inputs as of the last successful build
+BUILD_HASH_FILE = FRONTEND_DIR / ".build-cache-hash"
+
+# Shared keep-alive pool for the HTTP checks when run as a script; under
+# pytest they take the package-wide ``session`` fixture instead
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_maxsize=8, max_retries=RETRY))
+
+# Progress output is buffered in memory and written out in one go
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+log.propagate = False
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+LOG_BUFFER = logging.handlers.MemoryHandler(capacity=1000, target=_stdout_handler)
+
+# main() runs the checks concurrently; records logged while a check runs are
+# held per thread and replayed in declared order so sections never interleave
+_check_output = threading.local()
+
+class _PerCheckHandler(logging.Handler):
+    """Hold records for the check running on this thread, else pass them on."""
+    
+    def emit(self, record):
+        records = getattr(_check_output, "records", None)
+        if records is None:
+            LOG_BUFFER.handle(record)
+        else:
+            records.append(record)
+
+log.addHandler(_PerCheckHandler())
+
+def check_backend_health(session):
     """Test backend health and basic functionality."""
-    print("🔍 Testing Backend Health...")
+    log.info("🔍 Testing Backend Health...")
     
     try:
         # Test health endpoint
-        response = requests.get("http://localhost:8000/health", timeout=5)
+        response = session.get("http://localhost:8000/health", timeout=5)
         if response.status_code == 200:
-            print("✅ Backend health check passed")
+            log.info("✅ Backend health check passed")
             return True
         else:
-            print(f"❌ Backend health check failed: {response.status_code}")
+            log.info(f"❌ Backend health check failed: {response.status_code}")
             return False
     except requests.exceptions.RequestException as e:
-        print(f"❌ Backend not accessible: {e}")
+        log.info(f"❌ Backend not accessible: {e}")
         return False
 
-def test_provider_status():
+def check_provider_status(session):
     """Test provider status endpoint."""
-    print("\n📊 Testing Provider Status...")
+    log.info("\n📊 Testing Provider Status...")
     
     try:
-        response = requests.get("http://localhost:8000/provider/status", timeout=5)
+        response = session.get("http://localhost:8000/provider/status", timeout=5)
         if response.status_code == 200:
-            data = response.json()
-            print("✅ Provider status endpoint working")
-            print(f"   Status: {data.get('status', 'unknown')}")
-            print(f"   Provider Type: {data.get('provider_type', 'unknown')}")
-            print(f"   Last Fetch: {data.get('last_fetch_at', 'N/A')}")
+            data = json_loads(response.content)
+            log.info("✅ Provider status endpoint working")
+            log.info(f"   Status: {data.get('status', 'unknown')}")
+            log.info(f"   Provider Type: {data.get('provider_type', 'unknown')}")
+            log.info(f"   Last Fetch: {data.get('last_fetch_at', 'N/A')}")
             return True
         else:
-            print(f"❌ Provider status failed: {response.status_code}")
+            log.info(f"❌ Provider status failed: {response.status_code}")
             return False
     except requests.exceptions.RequestException as e:
-        print(f"❌ Provider status request failed: {e}")
+        log.info(f"❌ Provider status request failed: {e}")
         return False
 
-def test_backtest_endpoint():
+def check_backtest_endpoint(session):
     """Test backtest endpoint."""
-    print("\n📈 Testing Backtest Endpoint...")
+    log.info("\n📈 Testing Backtest Endpoint...")
     
     try:
-        response = requests.get("http://localhost:8000/backtest?max_cutoffs=1", timeout=10)
+        response = session.get("http://localhost:8000/backtest?max_cutoffs=1", timeout=10)
         if response.status_code == 200:
-            data = response.json()
-            print("✅ Backtest endpoint working")
-            print(f"   Cutoffs: {len(data.get('rows', []))}")
+            data = json_loads(response.content)
+            log.info("✅ Backtest endpoint working")
+            log.info(f"   Cutoffs: {len(data.get('rows', []))}")
             if 'avg' in data:
-                print(f"   Avg MAE: ${data['avg'].get('avg_mae', 0):.2f}")
+                log.info(f"   Avg MAE: ${data['avg'].get('avg_mae', 0):.2f}")
             return True
         else:
-            print(f"❌ Backtest failed: {response.status_code}")
-            print(f"   Response: {response.text[:200]}...")
+            log.info(f"❌ Backtest failed: {response.status_code}")
+            log.info(f"   Response: {response.text[:200]}...")
             return False
     except requests.exceptions.RequestException as e:
-        print(f"❌ Backtest request failed: {e}")
+        log.info(f"❌ Backtest request failed: {e}")
         return False
 
-def test_frontend_build():
+# Build outputs and installed dependencies; everything else in the frontend
+# directory (index.html, vite/ts configs, public/, .env*, ...) is an input
+FRONTEND_BUILD_EXCLUDES = {"node_modules", "dist", "dist-ssr", ".git"}
+
+def frontend_source_hash():
+    """Hash the path, mtime and size of every frontend build input."""
+    digest = hashlib.sha256()
+    inputs = []
+    for root, dirs, files in os.walk(FRONTEND_DIR):
+        dirs[:] = [name for name in dirs if name not in FRONTEND_BUILD_EXCLUDES]
+        inputs.extend(Path(root, name) for name in files)
+    for path in sorted(inputs):
+        if path == BUILD_HASH_FILE:
+            continue
+        stat = path.stat()
+        digest.update(f"{path.relative_to(FRONTEND_DIR)}\0{stat.st_mtime_ns}\0{stat.st_size}\n".encode())
+    return digest.hexdigest()
+
+def check_frontend_build():
     """Test frontend build process."""
-    print("\n🌐 Testing Frontend Build...")
+    log.info("\n🌐 Testing Frontend Build...")
     
     try:
+        # Skip the build when its inputs are unchanged since the last success
+        source_hash = frontend_source_hash()
+        if (FRONTEND_DIR / "dist" / "index.html").exists() and (
+            BUILD_HASH_FILE.exists() and BUILD_HASH_FILE.read_text() == source_hash
+        ):
+            log.info("✅ Frontend unchanged since last successful build")
+            return True
+        
         # Check if frontend can build without errors
         result = subprocess.run(
-            ["npm", "run", "build"],
-            cwd="/Users/ahmedalshari/Desktop/Gold/goldvision/frontend",
+            [NPM, "run", "build"],
+            cwd=FRONTEND_DIR,
             capture_output=True,
             text=True,
             timeout=60
         )
         
         if result.returncode == 0:
-            print("✅ Frontend builds successfully")
+            BUILD_HASH_FILE.write_text(source_hash)
+            log.info("✅ Frontend builds successfully")
             return True
         else:
-            print("❌ Frontend build failed")
-            print(f"   Error: {result.stderr[:200]}...")
+            log.info("❌ Frontend build failed")
+            log.info(f"   Error: {result.stderr[:200]}...")
             return False
     except subprocess.TimeoutExpired:
-        print("❌ Frontend build timed out")
+        log.info("❌ Frontend build timed out")
         return False
     except Exception as e:
-        print(f"❌ Frontend build error: {e}")
+        log.info(f"❌ Frontend build error: {e}")
         return False
 
-def test_api_endpoints():
+API_ENDPOINTS = (
+    ("/health", "Health check"),
+    ("/provider/status", "Provider status"),
+    ("/metrics", "Metrics endpoint"),
+)
+
+def check_api_endpoints(session):
     """Test various API endpoints."""
-    print("\n🔗 Testing API Endpoints...")
-    
-    endpoints = [
-        ("/health", "Health check"),
-        ("/provider/status", "Provider status"),
-        ("/metrics", "Metrics endpoint"),
-    ]
+    log.info("\n🔗 Testing API Endpoints...")
     
     success_count = 0
-    for endpoint, description in endpoints:
+    for endpoint, description in API_ENDPOINTS:
         try:
-            response = requests.get(f"http://localhost:8000{endpoint}", timeout=5)
+            response = session.get(f"http://localhost:8000{endpoint}", timeout=5)
             if response.status_code == 200:
-                print(f"✅ {description}: OK")
+                log.info(f"✅ {description}: OK")
                 success_count += 1
             else:
-                print(f"❌ {description}: {response.status_code}")
+                log.info(f"❌ {description}: {response.status_code}")
         except Exception as e:
-            print(f"❌ {description}: {e}")
+            log.info(f"❌ {description}: {e}")
     
-    return success_count == len(endpoints)
+    return success_count == len(API_ENDPOINTS)
+
+EXPECTED_METRICS = (b"http_requests_total", b"http_request_duration_ms")
+METRIC_NAME_OVERLAP = max(map(len, EXPECTED_METRICS)) - 1
 
-def test_metrics_functionality():
+def check_metrics_functionality(session):
     """Test metrics functionality."""
-    print("\n📊 Testing Metrics...")
+    log.info("\n📊 Testing Metrics...")
     
     try:
-        response = requests.get("http://localhost:8000/metrics", timeout=5)
-        if response.status_code == 200:
-            content = response.text
-            if "http_requests_total" in content and "http_request_duration_ms" in content:
-                print("✅ Metrics endpoint working with expected metrics")
-                return True
-            else:
-                print("⚠️  Metrics endpoint working but missing expected metrics")
+        with session.get("http://localhost:8000/metrics", stream=True, timeout=5) as response:
+            if response.status_code != 200:
+                log.info(f"❌ Metrics endpoint failed: {response.status_code}")
                 return False
+            
+            # Scan the raw bytes and stop reading once every metric has shown up;
+            # the tail of each chunk is kept so a name split across chunks matches
+            missing = set(EXPECTED_METRICS)
+            tail = b""
+            for chunk in response.iter_content(65536):
+                window = tail + chunk
+                missing = {name for name in missing if name not in window}
+                if not missing:
+                    break
+                tail = window[-METRIC_NAME_OVERLAP:]
+        
+        if not missing:
+            log.info("✅ Metrics endpoint working with expected metrics")
+            return True
         else:
-            print(f"❌ Metrics endpoint failed: {response.status_code}")
+            log.info("⚠️  Metrics endpoint working but missing expected metrics")
             return False
     except Exception as e:
-        print(f"❌ Metrics test failed: {e}")
+        log.info(f"❌ Metrics test failed: {e}")
         return False
 
+HTTP_CHECKS = (
+    check_backend_health,
+    check_provider_status,
+    check_backtest_endpoint,
+    check_api_endpoints,
+    check_metrics_functionality,
+)
+
+@pytest.mark.parametrize("check", HTTP_CHECKS, ids=lambda check: check.__name__)
+def test_http_check(session, check):
+    """Run one HTTP health check against the shared session."""
+    try:
+        assert check(session)
+    finally:
+        LOG_BUFFER.flush()
+
+def test_frontend_builds():
+    """Test the frontend builds (or is unchanged since its last build)."""
+    try:
+        assert check_frontend_build()
+    finally:
+        LOG_BUFFER.flush()
+
+def run_check(test_name, test_func):
+    """Run one check, returning its outcome and the log records it emitted."""
+    _check_output.records = records = []
+    try:
+        return test_func(), records
+    except Exception as e:
+        log.info(f"❌ {test_name} crashed: {e}")
+        return False, records
+    finally:
+        del _check_output.records
+
 def main():
     """Run all system health tests."""
-    print("🏥 GoldVision System Health Check")
-    print("=" * 40)
-    print(f"Timestamp: {datetime.now().isoformat()}")
-    print()
+    log.info("🏥 GoldVision System Health Check")
+    log.info("=" * 40)
+    log.info(f"Timestamp: {datetime.now().isoformat()}")
+    log.info("")
     
     tests = [
-        ("Backend Health", test_backend_health),
-        ("Provider Status", test_provider_status),
-        ("Backtest Endpoint", test_backtest_endpoint),
-        ("Frontend Build", test_frontend_build),
-        ("API Endpoints", test_api_endpoints),
-        ("Metrics Functionality", test_metrics_functionality),
+        ("Backend Health", partial(check_backend_health, SESSION)),
+        ("Provider Status", partial(check_provider_status, SESSION)),
+        ("Backtest Endpoint", partial(check_backtest_endpoint, SESSION)),
+        ("Frontend Build", check_frontend_build),
+        ("API Endpoints", partial(check_api_endpoints, SESSION)),
+        ("Metrics Functionality", partial(check_metrics_functionality, SESSION)),
     ]
     
+    # The checks are independent, so overlap their network and npm waits;
+    # each check's output is emitted in declared order once all have finished
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        runs = list(executor.map(lambda test: run_check(*test), tests))
     results = []
-    for test_name, test_func in tests:
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} crashed: {e}")
-            results.append((test_name, False))
+    for (test_name, _), (outcome, records) in zip(tests, runs):
+        for record in records:
+            LOG_BUFFER.handle(record)
+        results.append((test_name, outcome))
     
     # Summary
-    print("\n" + "=" * 40)
-    print("📋 Test Summary")
-    print("=" * 40)
+    log.info("\n" + "=" * 40)
+    log.info("📋 Test Summary")
+    log.info("=" * 40)
     
     passed = 0
     total = len(results)
     
     for test_name, result in results:
         status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{status} {test_name}")
+        log.info(f"{status} {test_name}")
         if result:
             passed += 1
     
-    print(f"\nOverall: {passed}/{total} tests passed")
+    log.info(f"\nOverall: {passed}/{total} tests passed")
     
     if passed == total:
-        print("🎉 All tests passed! System is healthy.")
-        return 0
+        log.info("🎉 All tests passed! System is healthy.")
     else:
-        print("⚠️  Some tests failed. Please review the issues above.")
-        return 1
+        log.info("⚠️  Some tests failed. Please review the issues above.")
+    LOG_BUFFER.flush()
+    return 0 if passed == total else 1
 
 if __name__ == "__main__":
     sys.exit(main())
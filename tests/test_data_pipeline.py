@@ -18,7 +18,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 # Import modules to test
 from scripts.generate_datasets import DatasetGenerator
-from scripts.update_latest import DataUpdater
+from scripts.update_latest import DataUpdater, _read_dataset, _write_dataset
 
 # Import Google Sheets uploader only if available
 try:
@@ -28,14 +28,56 @@ except ImportError:
     GOOGLE_SHEETS_AVAILABLE = False
     SheetsUploader = None
 
+# Date range shared by the generator tests and their cached datasets
+START_DATE = datetime(2024, 1, 1)
+END_DATE = datetime(2024, 1, 7)
+
+# Column order of the FX and gold datasets
+FX_COLS = ("ds", "base", "quote", "region", "rate", "source", "rate_type", "side")
+GOLD_COLS = ("ds", "unit", "karat", "price_usd", "price_yer", "price_type", "region", "source")
+
+# Column dtypes of the generated datasets (``ds`` is only formatted on save)
+FX_DTYPES = pd.Series(dict.fromkeys(FX_COLS, np.dtype(object)) | {
+    "ds": np.dtype("datetime64[ns]"),
+    "rate": np.dtype("float64"),
+})
+GOLD_DTYPES = pd.Series(dict.fromkeys(GOLD_COLS, np.dtype(object)) | {
+    "ds": np.dtype("datetime64[ns]"),
+    "karat": np.dtype("int64"),
+    "price_usd": np.dtype("float64"),
+    "price_yer": np.dtype("float64"),
+})
+
+@pytest.fixture(scope="session")
+def generator(tmp_path_factory):
+    """DatasetGenerator shared across tests; it keeps no per-test state."""
+    return DatasetGenerator(output_dir=str(tmp_path_factory.mktemp("datasets")))
+
+@pytest.fixture(scope="session")
+def updater(tmp_path_factory):
+    """DataUpdater shared by tests that never touch its data directory."""
+    return DataUpdater(data_dir=str(tmp_path_factory.mktemp("updates")))
+
+@pytest.fixture(scope="class")
+def pipeline_data(generator):
+    """FX and gold datasets for START_DATE..END_DATE, generated once per class."""
+    return {
+        "fx": generator.generate_fx_rates(START_DATE, END_DATE),
+        "gold": generator.generate_gold_prices(START_DATE, END_DATE),
+    }
+
+# Each class runs on a single pytest-xdist worker (``-n auto --dist loadgroup``);
+# every test writes to its own temporary directory, so workers never collide
+@pytest.mark.xdist_group(name="gen")
 class TestDatasetGenerator:
     """Test cases for DatasetGenerator."""
     
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, generator):
         """Set up test fixtures."""
-        self.generator = DatasetGenerator(output_dir="test_data")
-        self.start_date = datetime(2024, 1, 1)
-        self.end_date = datetime(2024, 1, 7)
+        self.generator = generator
+        self.start_date = START_DATE
+        self.end_date = END_DATE
     
     def test_usd_yer_rate_generation(self):
         """Test USD/YER rate generation."""
@@ -43,134 +85,169 @@ class TestDatasetGenerator:
         assert isinstance(rate, float)
         assert rate > 0
         assert rate >= 100  # Floor check
+        
+        # The array lookup used by the generators agrees with the scalar one
+        ds = pd.date_range(self.start_date, self.end_date).strftime('%Y-%m-%d')
+        rates = self.generator._get_usd_yer_rates(ds)
+        assert rates[0] == rate
+        assert (rates >= 100).all()
     
     def test_karat_price_calculation(self):
         """Test karat price calculations."""
         base_price_24k = 1000.0
         
-        # Test 24k (should be same as base)
-        price_24k = self.generator._calculate_karat_price(base_price_24k, 24)
-        assert price_24k == base_price_24k
+        # 24k is the base price, 21k is 87.5% of it and 18k is 75%
+        karats = np.array([24, 21, 18])
+        prices = self.generator._calculate_karat_price(base_price_24k, karats)
+        np.testing.assert_allclose(prices, [1000.0, 875.0, 750.0])
         
-        # Test 18k (should be 75% of base)
-        price_18k = self.generator._calculate_karat_price(base_price_24k, 18)
-        assert price_18k == 750.0
-        
-        # Test 21k (should be 87.5% of base)
-        price_21k = self.generator._calculate_karat_price(base_price_24k, 21)
-        assert price_21k == 875.0
+        # Scalar karats still return a plain float
+        assert self.generator._calculate_karat_price(base_price_24k, 18) == 750.0
     
     def test_retail_price_calculation(self):
         """Test retail price calculations."""
         base_price = 1000.0
         
-        # Test buy premium
-        buy_price = self.generator._calculate_retail_price(base_price, "buy")
-        assert buy_price == 1020.0  # 2% premium
-        
-        # Test sell discount
-        sell_price = self.generator._calculate_retail_price(base_price, "sell")
-        assert sell_price == 990.0  # 1% discount
+        # 2% buy premium, 1% sell discount, spot unchanged
+        price_types = np.array(["buy", "sell", "spot"])
+        prices = self.generator._calculate_retail_price(base_price, price_types)
+        np.testing.assert_allclose(prices, [1020.0, 990.0, 1000.0])
         
-        # Test spot (no change)
-        spot_price = self.generator._calculate_retail_price(base_price, "spot")
-        assert spot_price == 1000.0
+        assert self.generator._calculate_retail_price(base_price, "buy") == 1020.0
     
-    def test_fx_rates_generation(self):
+    def test_fx_rates_generation(self, pipeline_data):
         """Test FX rates dataset generation."""
-        fx_df = self.generator.generate_fx_rates(self.start_date, self.end_date)
+        fx_df = pipeline_data["fx"]
         
-        # Check structure
-        expected_columns = ["ds", "base", "quote", "region", "rate", "source", "rate_type", "side"]
-        assert list(fx_df.columns) == expected_columns
-        
-        # Check data types
-        assert fx_df["rate"].dtype == "float64"
-        assert fx_df["ds"].dtype == "object"
+        # Check structure and data types
+        pd.testing.assert_series_equal(fx_df.dtypes, FX_DTYPES)
         
         # Check date range
-        dates = pd.to_datetime(fx_df["ds"])
-        assert dates.min().date() == self.start_date.date()
-        assert dates.max().date() == self.end_date.date()
+        assert fx_df["ds"].min().date() == self.start_date.date()
+        assert fx_df["ds"].max().date() == self.end_date.date()
         
         # Check regions
-        assert set(fx_df["region"].unique()) == set(self.generator.YER_REGIONS)
+        assert sorted(fx_df["region"].unique().tolist()) == sorted(self.generator.YER_REGIONS)
         
         # Check rate types
-        assert set(fx_df["rate_type"].unique()) == {"mid", "buy", "sell"}
+        assert sorted(fx_df["rate_type"].unique().tolist()) == ["buy", "mid", "sell"]
         
         # Check rates are positive
-        assert (fx_df["rate"] > 0).all()
+        assert fx_df["rate"].min(skipna=False) > 0
         
         # Check expected number of records
         expected_records = 7 * len(self.generator.YER_REGIONS) * 3  # 7 days * 4 regions * 3 rate types
         assert len(fx_df) == expected_records
     
-    def test_gold_prices_generation(self):
+    def test_gold_prices_generation(self, pipeline_data):
         """Test gold prices dataset generation."""
-        gold_df = self.generator.generate_gold_prices(self.start_date, self.end_date)
+        gold_df = pipeline_data["gold"]
         
-        # Check structure
-        expected_columns = ["ds", "unit", "karat", "price_usd", "price_yer", "price_type", "region", "source"]
-        assert list(gold_df.columns) == expected_columns
-        
-        # Check data types
-        assert gold_df["price_usd"].dtype == "float64"
-        assert gold_df["price_yer"].dtype == "float64"
-        assert gold_df["karat"].dtype == "int64"
+        # Check structure and data types
+        pd.testing.assert_series_equal(gold_df.dtypes, GOLD_DTYPES)
         
         # Check date range
-        dates = pd.to_datetime(gold_df["ds"])
-        assert dates.min().date() == self.start_date.date()
-        assert dates.max().date() == self.end_date.date()
+        assert gold_df["ds"].min().date() == self.start_date.date()
+        assert gold_df["ds"].max().date() == self.end_date.date()
         
         # Check karats
-        assert set(gold_df["karat"].unique()) == set(self.generator.GOLD_KARATS)
+        assert sorted(gold_df["karat"].unique().tolist()) == sorted(self.generator.GOLD_KARATS)
         
         # Check regions
-        assert set(gold_df["region"].unique()) == set(self.generator.YER_REGIONS)
+        assert sorted(gold_df["region"].unique().tolist()) == sorted(self.generator.YER_REGIONS)
         
         # Check price types
-        assert set(gold_df["price_type"].unique()) == {"spot", "buy", "sell"}
+        assert sorted(gold_df["price_type"].unique().tolist()) == ["buy", "sell", "spot"]
         
         # Check prices are positive
-        assert (gold_df["price_usd"] > 0).all()
-        assert (gold_df["price_yer"] > 0).all()
+        assert gold_df["price_usd"].min(skipna=False) > 0
+        assert gold_df["price_yer"].min(skipna=False) > 0
         
         # Check expected number of records
         expected_records = 7 * len(self.generator.GOLD_KARATS) * len(self.generator.YER_REGIONS) * 3
         assert len(gold_df) == expected_records
     
-    def test_dataset_save_and_load(self):
+    @pytest.mark.parametrize("storage_format", ["csv", "parquet"])
+    def test_dataset_save_and_load(self, pipeline_data, storage_format, tmp_path):
         """Test dataset saving and loading."""
-        # Generate test data
-        fx_df = self.generator.generate_fx_rates(self.start_date, self.end_date)
-        gold_df = self.generator.generate_gold_prices(self.start_date, self.end_date)
-        
-        # Save datasets
-        fx_path, gold_path = self.generator.save_datasets(fx_df, gold_df)
+        fx_df = pipeline_data["fx"]
+        gold_df = pipeline_data["gold"]
+        
+        if storage_format == "csv":
+            # Save datasets into this test's own directory
+            generator = DatasetGenerator(output_dir=str(tmp_path))
+            fx_path, gold_path = generator.save_datasets(fx_df, gold_df)
+            
+            # Verify files exist
+            assert Path(fx_path).exists()
+            assert Path(gold_path).exists()
+            
+            # Read the written files back
+            pd.testing.assert_frame_equal(pd.read_csv(fx_path, parse_dates=["ds"]), fx_df)
+            pd.testing.assert_frame_equal(pd.read_csv(gold_path, parse_dates=["ds"]), gold_df)
+        else:
+            pytest.importorskip("pyarrow")
+            fx_path = tmp_path / "fx_yer.parquet"
+            gold_path = tmp_path / "gold_prices.parquet"
+            _write_dataset(fx_df, fx_path)
+            _write_dataset(gold_df, gold_path)
+            
+            # Parquet stores column types, so the frames come back unchanged
+            pd.testing.assert_frame_equal(_read_dataset(fx_path), fx_df)
+            pd.testing.assert_frame_equal(_read_dataset(gold_path), gold_df)
+    
+    def test_chunked_save_across_years(self, tmp_path):
+        """Test year-by-year chunked generation and saving."""
+        start_date = datetime(2023, 12, 30)
+        end_date = datetime(2024, 1, 2)
         
-        # Verify files exist
-        assert Path(fx_path).exists()
-        assert Path(gold_path).exists()
+        generator = DatasetGenerator(output_dir=str(tmp_path))
+        fx_path, gold_path = generator.save_datasets_chunked(start_date, end_date)
         
-        # Load and verify data
         loaded_fx = pd.read_csv(fx_path)
         loaded_gold = pd.read_csv(gold_path)
         
-        assert len(loaded_fx) == len(fx_df)
-        assert len(loaded_gold) == len(gold_df)
+        # Single header, all days from both chunks present
+        assert len(loaded_fx) == 4 * len(self.generator.YER_REGIONS) * 3
+        assert len(loaded_gold) == 4 * len(self.generator.GOLD_KARATS) * len(self.generator.YER_REGIONS) * 3
+        assert loaded_fx["ds"].min() == "2023-12-30"
+        assert loaded_fx["ds"].max() == "2024-01-02"
+
+    def test_chunked_save_parallel_matches_sequential(self, tmp_path):
+        """Test parallel chunk generation writes the same data as in-process."""
+        start_date = datetime(2022, 12, 30)
+        end_date = datetime(2024, 1, 2)
+        
+        fx_path, gold_path = DatasetGenerator(output_dir=str(tmp_path)).save_datasets_chunked(
+            start_date, end_date, workers=1
+        )
+        sequential_fx = pd.read_csv(fx_path)
+        sequential_gold = pd.read_csv(gold_path)
         
-        # Clean up
-        Path(fx_path).unlink()
-        Path(gold_path).unlink()
+        DatasetGenerator(output_dir=str(tmp_path)).save_datasets_chunked(start_date, end_date, workers=2)
+        
+        pd.testing.assert_frame_equal(pd.read_csv(fx_path), sequential_fx)
+        pd.testing.assert_frame_equal(pd.read_csv(gold_path), sequential_gold)
+
+    def test_chunked_sample_matches_full_datasets(self, tmp_path, capsys):
+        """Test the chunked sample report matches one built from the saved files."""
+        generator = DatasetGenerator(output_dir=str(tmp_path))
+        fx_path, gold_path = generator.save_datasets_chunked(
+            datetime(2022, 12, 30), datetime(2024, 1, 2), workers=1, print_sample=True
+        )
+        chunked_report = capsys.readouterr().out
 
+        generator.print_sample_data(pd.read_csv(fx_path), pd.read_csv(gold_path))
+        assert chunked_report == capsys.readouterr().out
+
+@pytest.mark.xdist_group(name="upd")
 class TestDataUpdater:
     """Test cases for DataUpdater."""
     
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, updater):
         """Set up test fixtures."""
-        self.updater = DataUpdater(data_dir="test_data")
+        self.updater = updater
         self.start_date = datetime(2024, 1, 1)
         self.end_date = datetime(2024, 1, 7)
     
@@ -178,49 +255,39 @@ class TestDataUpdater:
         """Test karat price calculations."""
         base_price_24k = 1000.0
         
-        # Test 24k
-        price_24k = self.updater._calculate_karat_price(base_price_24k, 24)
-        assert price_24k == base_price_24k
-        
-        # Test 18k
-        price_18k = self.updater._calculate_karat_price(base_price_24k, 18)
-        assert price_18k == 750.0
+        prices = self.updater._calculate_karat_price(base_price_24k, np.array([24, 18]))
+        np.testing.assert_allclose(prices, [1000.0, 750.0])
     
     def test_retail_price_calculation(self):
         """Test retail price calculations."""
         base_price = 1000.0
         
-        # Test buy premium
-        buy_price = self.updater._calculate_retail_price(base_price, "buy")
-        assert buy_price == 1020.0
-        
-        # Test sell discount
-        sell_price = self.updater._calculate_retail_price(base_price, "sell")
-        assert sell_price == 990.0
+        prices = self.updater._calculate_retail_price(base_price, np.array(["buy", "sell"]))
+        np.testing.assert_allclose(prices, [1020.0, 990.0])
     
     def test_latest_fx_rates_generation(self):
         """Test latest FX rates generation."""
         fx_df = self.updater.generate_latest_fx_rates(self.start_date, self.end_date)
         
         # Check structure
-        expected_columns = ["ds", "base", "quote", "region", "rate", "source", "rate_type", "side"]
-        assert list(fx_df.columns) == expected_columns
+        assert tuple(fx_df.columns) == FX_COLS
         
         # Check date range
         dates = pd.to_datetime(fx_df["ds"])
         assert dates.min().date() == self.start_date.date()
         assert dates.max().date() == self.end_date.date()
         
-        # Check rates are positive
-        assert (fx_df["rate"] > 0).all()
+        # Check rates are positive, and kept at full precision so merging with
+        # the float64 history doesn't add rounding noise
+        assert fx_df["rate"].min(skipna=False) > 0
+        assert fx_df["rate"].dtype == "float64"
     
     def test_latest_gold_prices_generation(self):
         """Test latest gold prices generation."""
         gold_df = self.updater.generate_latest_gold_prices(self.start_date, self.end_date)
         
         # Check structure
-        expected_columns = ["ds", "unit", "karat", "price_usd", "price_yer", "price_type", "region", "source"]
-        assert list(gold_df.columns) == expected_columns
+        assert tuple(gold_df.columns) == GOLD_COLS
         
         # Check date range
         dates = pd.to_datetime(gold_df["ds"])
@@ -228,8 +295,13 @@ class TestDataUpdater:
         assert dates.max().date() == self.end_date.date()
         
         # Check prices are positive
-        assert (gold_df["price_usd"] > 0).all()
-        assert (gold_df["price_yer"] > 0).all()
+        assert gold_df["price_usd"].min(skipna=False) > 0
+        assert gold_df["price_yer"].min(skipna=False) > 0
+        assert gold_df["price_usd"].dtype == "float64"
+        
+        # Check one USD/YER rate per day across karats and regions
+        implied_rate = (gold_df["price_yer"] / gold_df["price_usd"]).groupby(gold_df["ds"])
+        assert ((implied_rate.max() - implied_rate.min()) < 1.0).all()
     
     def test_dataset_merge(self):
         """Test dataset merging functionality."""
@@ -255,17 +327,123 @@ class TestDataUpdater:
         
         # Check that new data takes precedence
         assert merged[merged["ds"] == "2024-01-02"]["rate"].iloc[0] == 502.0
+    
+    @pytest.mark.parametrize("n_days,n_regions", [(10, 4), (10_000, 100)])
+    def test_dataset_merge_scales(self, n_days, n_regions):
+        """Test merging stays correct on large (up to 1M-row) datasets."""
+        regions = [f"R{i}" for i in range(n_regions)]
+        days = pd.date_range("1970-01-01", periods=n_days, freq="D").strftime("%Y-%m-%d")
+        existing_data = pd.DataFrame({
+            "ds": np.repeat(days, n_regions),
+            "region": np.tile(regions, n_days),
+            "rate": np.full(n_days * n_regions, 500.0)
+        })
+        
+        # New window re-covers the last two days and adds one more
+        new_days = list(days[-2:]) + ["2999-01-01"]
+        new_data = pd.DataFrame({
+            "ds": np.repeat(new_days, n_regions),
+            "region": np.tile(regions, len(new_days)),
+            "rate": np.full(len(new_days) * n_regions, 502.0)
+        })
+        
+        merged = self.updater.merge_datasets(existing_data, new_data, ["ds", "region"])
+        
+        assert len(merged) == (n_days + 1) * n_regions
+        assert not merged.duplicated(["ds", "region"]).any()
+        assert (merged["rate"].iloc[-len(new_data):] == 502.0).all()
+
+    def test_incremental_update_appends_new_days(self, tmp_path):
+        """Test incremental update only appends rows after the latest date."""
+        updater = DataUpdater(data_dir=str(tmp_path))
+        last_day = datetime.now() - timedelta(days=2)
+        
+        existing_fx = updater.generate_latest_fx_rates(last_day - timedelta(days=1), last_day)
+        existing_gold = updater.generate_latest_gold_prices(last_day - timedelta(days=1), last_day)
+        existing_fx.to_csv(updater.fx_path, index=False)
+        existing_gold.to_csv(updater.gold_path, index=False)
+        
+        updater.update_datasets()
+        
+        updated_fx = pd.read_csv(updater.fx_path)
+        updated_gold = pd.read_csv(updater.gold_path)
+        
+        # Existing rows untouched, two new days appended without duplicates
+        assert updated_fx.iloc[:len(existing_fx)]["rate"].tolist() == existing_fx["rate"].tolist()
+        assert updated_fx["ds"].nunique() == 4
+        assert not updated_fx.duplicated(["ds", "region", "rate_type"]).any()
+        assert updated_gold["ds"].nunique() == 4
+        assert not updated_gold.duplicated(["ds", "karat", "region", "price_type"]).any()
+        
+        # Appended rows are byte-for-byte what pandas writes for them, like the history
+        for path, existing in ((updater.fx_path, existing_fx), (updater.gold_path, existing_gold)):
+            lines = path.read_text().splitlines(keepends=True)
+            appended = pd.read_csv(path, dtype={"ds": str}).iloc[len(existing):]
+            assert "".join(lines[len(existing) + 1:]) == appended.to_csv(index=False, header=False)
+
+    def test_csv_append_matches_pandas(self, tmp_path):
+        """Test appended CSV rows are byte-identical to a single pandas write."""
+        history = pd.DataFrame({"ds": ["2024-01-01"], "region": ["SANA"], "rate": [530.0]})
+        new = pd.DataFrame({"ds": ["2024-01-02"], "region": ["SANA"], "rate": [531.0]})
+        path = tmp_path / "fx_yer.csv"
+        history.to_csv(path, index=False)
+
+        _write_dataset(new, path, append=True)
+
+        expected = pd.concat([history, new]).to_csv(index=False)
+        assert path.read_text() == expected
+
+    def test_incremental_update_parquet(self, tmp_path):
+        """Test incremental update with Parquet storage."""
+        pytest.importorskip("pyarrow")
+        updater = DataUpdater(data_dir=str(tmp_path), storage_format="parquet")
+        
+        updater.update_datasets()
+        first_fx = pd.read_parquet(updater.fx_path)
+        updater.update_datasets()
+        
+        # Second run is a no-op once data is current
+        assert updater.fx_path.suffix == ".parquet"
+        assert len(pd.read_parquet(updater.fx_path)) == len(first_fx)
+        assert updater._read_max_date(updater.gold_path) == first_fx["ds"].max()
+
+    def test_incremental_update_partitioned(self, tmp_path):
+        """Test incremental update writes one Parquet partition per new day."""
+        pytest.importorskip("pyarrow")
+        updater = DataUpdater(data_dir=str(tmp_path), storage_format="partitioned")
+        last_day = datetime.now() - timedelta(days=2)
+        
+        existing_fx = updater.generate_latest_fx_rates(last_day - timedelta(days=1), last_day)
+        existing_gold = updater.generate_latest_gold_prices(last_day - timedelta(days=1), last_day)
+        _write_dataset(existing_fx, updater.fx_path)
+        _write_dataset(existing_gold, updater.gold_path)
+        old_partition = next(updater.fx_path.glob("ds=*/*.parquet"))
+        old_mtime = old_partition.stat().st_mtime_ns
+        
+        updater.update_datasets()
+        
+        updated_fx = _read_dataset(updater.fx_path)
+        assert updater.fx_path.is_dir()
+        assert len(list(updater.fx_path.glob("ds=*"))) == 4
+        assert list(updated_fx.columns) == list(existing_fx.columns)
+        assert updated_fx["ds"].is_monotonic_increasing
+        assert not updated_fx.duplicated(["ds", "region", "rate_type"]).any()
+        assert updater._read_max_date(updater.gold_path) == updated_fx["ds"].max()
+        
+        # Historical partitions are not rewritten
+        assert old_partition.stat().st_mtime_ns == old_mtime
 
 @pytest.mark.skipif(not GOOGLE_SHEETS_AVAILABLE, reason="Google Sheets API not available")
+@pytest.mark.xdist_group(name="sheets")
 class TestSheetsUploader:
     """Test cases for SheetsUploader."""
     
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
         """Set up test fixtures."""
         self.credentials_path = "test_credentials.json"
         self.spreadsheet_id = "test_spreadsheet_id"
-        self.data_dir = Path("test_data")
-        self.data_dir.mkdir(exist_ok=True)
+        self.data_dir = tmp_path
         
         # Create test data files
         self.fx_path = self.data_dir / "fx_yer.csv"
@@ -297,15 +475,6 @@ class TestSheetsUploader:
         fx_data.to_csv(self.fx_path, index=False)
         gold_data.to_csv(self.gold_path, index=False)
     
-    def teardown_method(self):
-        """Clean up test fixtures."""
-        if self.fx_path.exists():
-            self.fx_path.unlink()
-        if self.gold_path.exists():
-            self.gold_path.unlink()
-        if self.data_dir.exists():
-            self.data_dir.rmdir()
-    
     @patch('scripts.upload_to_sheets.Credentials')
     @patch('scripts.upload_to_sheets.build')
     def test_service_initialization(self, mock_build, mock_credentials):
@@ -332,12 +501,22 @@ class TestSheetsUploader:
         # Test loading FX data
         fx_df = uploader._load_dataset(self.fx_path)
         assert len(fx_df) == 2
-        assert list(fx_df.columns) == ["ds", "base", "quote", "region", "rate", "source", "rate_type", "side"]
+        assert tuple(fx_df.columns) == FX_COLS
         
         # Test loading gold data
         gold_df = uploader._load_dataset(self.gold_path)
         assert len(gold_df) == 2
-        assert list(gold_df.columns) == ["ds", "unit", "karat", "price_usd", "price_yer", "price_type", "region", "source"]
+        assert tuple(gold_df.columns) == GOLD_COLS
+    
+    def test_load_dataset_matches_default_parser(self):
+        """Test CSV loading yields the same frame as pandas' default parser."""
+        with patch.object(SheetsUploader, '_initialize_service', return_value=MagicMock()):
+            uploader = SheetsUploader(self.credentials_path, self.spreadsheet_id, str(self.data_dir))
+        
+        for path in (self.fx_path, self.gold_path):
+            df = uploader._load_dataset(path)
+            pd.testing.assert_frame_equal(df, pd.read_csv(path))
+            assert df["ds"].dtype == "object"
     
     def test_prepare_data_for_sheets(self):
         """Test data preparation for Google Sheets."""
@@ -349,55 +528,168 @@ class TestSheetsUploader:
         # Prepare data
         prepared_data = uploader._prepare_data_for_sheets(fx_df)
         
-        # Check structure
-        assert len(prepared_data) == 3  # Header + 2 data rows
-        assert prepared_data[0] == list(fx_df.columns)  # Header row
-        assert prepared_data[1] == list(fx_df.iloc[0])  # First data row
-        assert prepared_data[2] == list(fx_df.iloc[1])  # Second data row
+        # Check structure: header row, then the 2 data rows
+        assert len(prepared_data) == 3
+        assert prepared_data == [list(fx_df.columns)] + fx_df.to_numpy().tolist()
+    
+    @patch('scripts.upload_to_sheets.CELLS_PER_BATCH', 4)
+    def test_update_sheet_batches_rows(self):
+        """Test sheet updates are split into batchUpdate requests by cell count."""
+        with patch.object(SheetsUploader, '_initialize_service', return_value=MagicMock()):
+            uploader = SheetsUploader(self.credentials_path, self.spreadsheet_id, str(self.data_dir))
+        
+        data = [["ds", "rate"], ["2024-01-01", 500.0], ["2024-01-02", 501.0]]
+        uploader._update_sheet("fx_rates", data)
+        
+        # 2 columns x 4 cells per request: two rows, then the last one
+        batch_update = uploader.service.spreadsheets().values().batchUpdate
+        bodies = [call.kwargs["body"] for call in batch_update.call_args_list]
+        assert [[r["range"] for r in body["data"]] for body in bodies] == [["fx_rates!A1"], ["fx_rates!A3"]]
+        assert bodies[1]["data"][0]["values"] == [["2024-01-02", 501.0]]
+
+    def test_clear_stale_rows_only_when_shrinking(self):
+        """Test stale-row clears are skipped for non-shrinking uploads."""
+        with patch.object(SheetsUploader, '_initialize_service', return_value=MagicMock()):
+            uploader = SheetsUploader(self.credentials_path, self.spreadsheet_id, str(self.data_dir))
+        clear = uploader.service.spreadsheets().values().clear
+        
+        try:
+            # Unknown previous size: clear the whole sheet
+            uploader._clear_stale_rows("fx_rates", 3)
+            assert clear.call_args.kwargs["range"] == "fx_rates!A:Z"
+            
+            # Counts recorded for another spreadsheet don't apply
+            clear.reset_mock()
+            uploader._record_row_count("fx_rates", 3)
+            uploader.spreadsheet_id = "other_spreadsheet_id"
+            uploader._clear_stale_rows("fx_rates", 5)
+            assert clear.call_args.kwargs["range"] == "fx_rates!A:Z"
+            uploader.spreadsheet_id = self.spreadsheet_id
+            
+            # Growing dataset: no clear
+            clear.reset_mock()
+            uploader._record_row_count("fx_rates", 3)
+            uploader._clear_stale_rows("fx_rates", 5)
+            clear.assert_not_called()
+            
+            # Shrinking dataset: clear only the rows left behind
+            uploader._record_row_count("fx_rates", 5)
+            uploader._clear_stale_rows("fx_rates", 2)
+            assert clear.call_args.kwargs["range"] == "fx_rates!A3:Z5"
+        finally:
+            uploader.row_counts_path.unlink(missing_ok=True)
+
+    def test_incremental_upload_appends_new_rows(self):
+        """Test incremental upload appends only rows since the given date."""
+        with patch.object(SheetsUploader, '_initialize_service', return_value=MagicMock()):
+            uploader = SheetsUploader(self.credentials_path, self.spreadsheet_id, str(self.data_dir))
+        
+        uploader.upload_fx_rates_incremental("2024-01-02")
+        
+        append = uploader.service.spreadsheets().values().append
+        append.assert_called_once()
+        kwargs = append.call_args.kwargs
+        assert kwargs["insertDataOption"] == "INSERT_ROWS"
+        assert [row[0] for row in kwargs["body"]["values"]] == ["2024-01-02"]
+        uploader.service.spreadsheets().values().clear.assert_not_called()
+
+    def test_upload_all_uses_per_thread_services(self):
+        """Test concurrent loads clear through their own service per worker thread."""
+        with patch.object(SheetsUploader, '_initialize_service', side_effect=lambda: MagicMock()):
+            uploader = SheetsUploader(self.credentials_path, self.spreadsheet_id, str(self.data_dir))
+            main_service = uploader.service
+            
+            try:
+                uploader.upload_all()
+                
+                # Workers never touch the main thread's connection
+                main_service.spreadsheets().values().clear.assert_not_called()
+                assert uploader._read_row_counts() == {"fx_rates": 3, "gold_prices": 3}
+            finally:
+                uploader.row_counts_path.unlink(missing_ok=True)
+
+    def test_batch_update_single_call(self):
+        """Test a full upload writes both sheets with one batchUpdate."""
+        with patch.object(SheetsUploader, '_initialize_service', side_effect=lambda: MagicMock()):
+            uploader = SheetsUploader(self.credentials_path, self.spreadsheet_id, str(self.data_dir))
+            
+            try:
+                uploader.upload_all()
+            finally:
+                uploader.row_counts_path.unlink(missing_ok=True)
+        
+        values = uploader.service.spreadsheets().values()
+        assert values.batchUpdate.call_count == 1
+        values.update.assert_not_called()
+        body = values.batchUpdate.call_args.kwargs["body"]
+        assert [r["range"] for r in body["data"]] == ["fx_rates!A1", "gold_prices!A1"]
+        assert [len(r["values"]) for r in body["data"]] == [3, 3]
 
 class TestIntegration:
     """Integration tests for the complete pipeline."""
     
-    def test_end_to_end_pipeline(self):
+    def test_generation_smoke(self, generator):
+        """Smoke-test the real generators over a single day."""
+        day = datetime(2024, 1, 1)
+        
+        fx_df = generator.generate_fx_rates(day, day)
+        gold_df = generator.generate_gold_prices(day, day)
+        
+        # Verify data quality
+        assert len(fx_df) == len(generator.YER_REGIONS) * 3
+        assert len(gold_df) == len(generator.GOLD_KARATS) * len(generator.YER_REGIONS) * 3
+        assert fx_df["rate"].min(skipna=False) > 0
+        assert gold_df["price_usd"].min(skipna=False) > 0
+        assert gold_df["price_yer"].min(skipna=False) > 0
+    
+    def test_end_to_end_pipeline(self, updater):
         """Test complete end-to-end pipeline."""
         # This would test the complete pipeline from data generation to Google Sheets upload
         # For now, we'll test the data generation and update components
         
-        # Test data generation
-        generator = DatasetGenerator(output_dir="test_data")
-        start_date = datetime(2024, 1, 1)
-        end_date = datetime(2024, 1, 3)
-        
-        fx_df = generator.generate_fx_rates(start_date, end_date)
-        gold_df = generator.generate_gold_prices(start_date, end_date)
-        
-        # Verify data quality
-        assert len(fx_df) > 0
-        assert len(gold_df) > 0
-        assert (fx_df["rate"] > 0).all()
-        assert (gold_df["price_usd"] > 0).all()
-        assert (gold_df["price_yer"] > 0).all()
+        # Generation itself is covered by TestDatasetGenerator; stand in with
+        # 4-row frames so this test only exercises the update and merge steps
+        ds = pd.to_datetime(["2024-01-01", "2024-01-01", "2024-01-02", "2024-01-02"])
+        tiny_fx = pd.DataFrame({
+            "ds": ds,
+            "base": "USD",
+            "quote": "YER",
+            "region": ["ADEN", "SANA", "ADEN", "SANA"],
+            "rate": [1600.0, 530.0, 1601.0, 531.0],
+            "source": "goldvision_synthetic",
+            "rate_type": "mid",
+            "side": "both",
+        })
+        tiny_gold = pd.DataFrame({
+            "ds": ds,
+            "unit": "gram",
+            "karat": 24,
+            "price_usd": [65.0, 65.0, 65.5, 65.5],
+            "price_yer": [104000.0, 34450.0, 104865.5, 34780.5],
+            "price_type": "spot",
+            "region": ["ADEN", "SANA", "ADEN", "SANA"],
+            "source": "goldvision_synthetic",
+        })
         
         # Test data update
-        updater = DataUpdater(data_dir="test_data")
-        new_start = datetime(2024, 1, 4)
-        new_end = datetime(2024, 1, 5)
+        new_start = datetime(2024, 1, 3)
+        new_end = datetime(2024, 1, 3)
         
         new_fx = updater.generate_latest_fx_rates(new_start, new_end)
         new_gold = updater.generate_latest_gold_prices(new_start, new_end)
         
-        # Test merging
+        # Test merging; on disk ``ds`` is an ISO string, as save_datasets writes it
+        fx_df = tiny_fx.assign(ds=tiny_fx["ds"].dt.strftime("%Y-%m-%d"))
+        gold_df = tiny_gold.assign(ds=tiny_gold["ds"].dt.strftime("%Y-%m-%d"))
         merged_fx = updater.merge_datasets(fx_df, new_fx, ["ds", "region", "rate_type"])
         merged_gold = updater.merge_datasets(gold_df, new_gold, ["ds", "karat", "region", "price_type"])
         
         # Verify merge results
         assert len(merged_fx) == len(fx_df) + len(new_fx)
         assert len(merged_gold) == len(gold_df) + len(new_gold)
-        
-        # Clean up
-        import shutil
-        if Path("test_data").exists():
-            shutil.rmtree("test_data")
+        assert list(merged_fx.columns) == list(tiny_fx.columns)
+        assert merged_fx["ds"].tolist()[:4] == ["2024-01-01"] * 2 + ["2024-01-02"] * 2
+        assert (merged_fx["ds"].iloc[4:] == "2024-01-03").all()
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Data Pipeline Property Tests
+Sample-based checks of generate + merge over random date windows.
+"""
+
+import sys
+import pytest
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import example, given, settings, strategies as st
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.generate_datasets import DatasetGenerator
+from scripts.update_latest import DataUpdater
+
+FX_KEYS = ["ds", "region", "rate_type"]
+GOLD_KEYS = ["ds", "karat", "region", "price_type"]
+
+@pytest.fixture(scope="module")
+def generator(tmp_path_factory):
+    """DatasetGenerator shared across examples; it keeps no per-test state."""
+    return DatasetGenerator(output_dir=str(tmp_path_factory.mktemp("datasets")))
+
+@pytest.fixture(scope="module")
+def updater(tmp_path_factory):
+    """DataUpdater shared across examples; merging never touches disk."""
+    return DataUpdater(data_dir=str(tmp_path_factory.mktemp("updates")))
+
+@pytest.mark.xdist_group(name="gen")
+class TestMergeProperties:
+    """Merge invariants over small random windows of generated data."""
+
+    @settings(max_examples=25, deadline=None)
+    @given(
+        start=st.dates(min_value=date(2015, 1, 1), max_value=date(2030, 12, 31)),
+        n_days=st.integers(1, 5),
+        new_offset=st.integers(0, 6),
+        n_new_days=st.integers(1, 3),
+    )
+    # The fixed window the end-to-end test used to generate
+    @example(start=date(2024, 1, 1), n_days=3, new_offset=3, n_new_days=2)
+    def test_merge_replaces_overlapping_days(self, generator, updater, start, n_days,
+                                             new_offset, n_new_days):
+        """Test existing rows from the new window's first day onwards are replaced."""
+        start = datetime.combine(start, datetime.min.time())
+        end = start + timedelta(days=n_days - 1)
+        new_start = start + timedelta(days=new_offset)
+        new_end = new_start + timedelta(days=n_new_days - 1)
+
+        for existing, new, keys in (
+            (generator.generate_fx_rates(start, end),
+             updater.generate_latest_fx_rates(new_start, new_end), FX_KEYS),
+            (generator.generate_gold_prices(start, end),
+             updater.generate_latest_gold_prices(new_start, new_end), GOLD_KEYS),
+        ):
+            # On disk ``ds`` is an ISO string, as save_datasets writes it
+            existing = existing.assign(ds=existing["ds"].dt.strftime("%Y-%m-%d"))
+            merged = updater.merge_datasets(existing, new, keys)
+
+            kept = existing[existing["ds"] < new_start.strftime("%Y-%m-%d")]
+            assert len(merged) == len(kept) + len(new)
+            assert merged["ds"].is_monotonic_increasing
+            assert not merged.duplicated(keys).any()
+            if new_offset >= n_days:
+                # Disjoint windows keep every existing row
+                assert len(merged) == len(existing) + len(new)